@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Per-backtrack cost of EbuildDepvarParser as the depvar grows.
+
+Every failed `require()` resets the parser, compare the trail truncation with
+the previous rebuild of the whole parcel list.
+
+    PYTHONPATH=. python benchmarks/bench_backtrack.py
+
+Run from the repository root, or with revdep installed and without
+`PYTHONPATH`.
+
+"""
+import time
+from revdep.depvar_parser import EbuildDepvarParser
+
+DEPVAR = (
+    ">=dev-libs/glib-2.0 x11-libs/gtk+:3 X? ( x11-libs/libX11 ) "
+    "|| ( a/b c/d ) dev-qt/qtcore:5[icu,-debug] ^^ ( a/b c/d ) "
+    "python_targets_python3_12? ( dev-lang/python:3.12[sqlite] ) ")
+
+class FilteringParser(EbuildDepvarParser):
+    def reset(self, i=None, mark=None):
+        if i is None: i = self.i
+        self.parcels = [p for p in self.parcels if p.index_start<i]
+
+def bench(parser_class, depvar):
+    parser = parser_class(depvar)
+    backtracks = 0
+    reset = parser.reset
+    def counting_reset(*args):
+        nonlocal backtracks
+        backtracks += 1
+        reset(*args)
+    parser.reset = counting_reset
+    start = time.perf_counter()
+    parser.root()
+    return time.perf_counter() - start, backtracks
+
+def main():
+    print(f"{'chars':>8} {'backtracks':>10} "
+        f"{'trail us/bt':>12} {'filter us/bt':>12}")
+    for n in (1, 2, 4, 8, 16, 32):
+        depvar = DEPVAR*n
+        trail, backtracks = bench(EbuildDepvarParser, depvar)
+        filtering, _ = bench(FilteringParser, depvar)
+        print(f"{len(depvar):>8} {backtracks:>10} "
+            f"{trail/backtracks*1e6:>12.1f} {filtering/backtracks*1e6:>12.1f}")
+
+if __name__ == '__main__':
+    main()
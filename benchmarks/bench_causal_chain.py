@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Serial against threaded AtomCausalChain with a stand-in portageq that sleeps
+before answering, like the real one starting up.
+
+    PYTHONPATH=. python benchmarks/bench_causal_chain.py [packages] [latency]
+
+Run from the repository root, or with revdep installed and without
+`PYTHONPATH`.
+
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from revdep.atom_causal_chain import AtomCausalChain
+from revdep.depvars import PortageqWorker
+from revdep.rdep_chain import SystemReverseDependencyChain
+
+PORTAGEQ = """#!{python}
+import sys, time
+time.sleep({latency})
+for key in sys.argv[5:]:
+    print({rdepend!r} if key == "RDEPEND" else "")
+"""
+
+def emerge_output(packages):
+    lines = ["Calculating dependencies  ... done!", "  dev-libs/target-1.0 pulled in by:"]
+    lines += [f"    app-misc/pkg{i}-1.0 requires dev-libs/target" for i in range(packages)]
+    for i in range(packages):
+        lines += ["", f"  app-misc/pkg{i}-1.0 pulled in by:", "    @selected"]
+    return "\n".join(lines + ["", ">>> done"])
+
+def bench(rdep_chain, jobs):
+    start = time.perf_counter()
+    with PortageqWorker(portage_api=False, processes=jobs or 1) as worker:
+        chain = AtomCausalChain(rdep_chain, "dev-libs/target-1.0", worker=worker, jobs=jobs)
+        links = list(chain.causal_chain)
+    return time.perf_counter() - start, len(links)
+
+def main(packages=32, latency=0.2):
+    rdep_chain = SystemReverseDependencyChain(emerge_output(packages))
+    with tempfile.TemporaryDirectory() as bin_dir:
+        portageq = Path(bin_dir) / "portageq"
+        portageq.write_text(PORTAGEQ.format(
+            python=sys.executable, latency=latency,
+            rdepend=">=dev-libs/target-1.0 x? ( dev-libs/other )"))
+        portageq.chmod(0o755)
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+        print(f"{packages} packages, {latency}s portageq latency")
+        serial, _ = bench(rdep_chain, None)
+        print(f"{'serial':>8} {serial:8.2f}s")
+        for jobs in (2, 4, 8, 16):
+            elapsed, _ = bench(rdep_chain, jobs)
+            print(f"{f'jobs={jobs}':>8} {elapsed:8.2f}s {serial/elapsed:6.1f}x")
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 32, float(args[1]) if args[1:] else 0.2)
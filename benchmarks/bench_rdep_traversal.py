@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Reverse dependency chains of synthetic graphs, recursive walk with a list of
+seen packages against the explicit stack/queue walk with a set.
+
+    PYTHONPATH=. python benchmarks/bench_rdep_traversal.py [nodes] [fanout]
+
+Run from the repository root, or with revdep installed and without
+`PYTHONPATH`.
+
+"""
+import sys
+import time
+from revdep.rdep_chain import SystemReverseDependencyChain
+from synthetic import synthetic_dependees
+
+def recursive_chain(dependees, pkgname, _seen=None, _level=0):
+    if _seen is None: _seen = []
+    yield((_level,pkgname,))
+    for dependee in dependees.get(pkgname, []):
+        if dependee in _seen: continue
+        if not dependee.startswith("@"): _seen.append(dependee)
+        yield from recursive_chain(dependees, dependee, _seen, _level+1)
+
+def timed(chain):
+    start = time.perf_counter()
+    count = sum(1 for _ in chain)
+    return time.perf_counter() - start, count
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    fanout = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rdep_chain = SystemReverseDependencyChain("")
+    rdep_chain.dependees_by_dependency = synthetic_dependees(nodes, fanout)
+    graph = rdep_chain.compact()
+    root = "cat/pkg0-1"
+
+    print(f"{nodes} packages, {fanout} dependees each")
+    for name, chain in [
+        ("dict dfs", rdep_chain.get_pkg_rdep_chain(root)),
+        ("dict bfs", rdep_chain.get_pkg_rdep_chain(root, order="bfs")),
+        ("compact dfs", graph.get_pkg_rdep_chain(root)),
+        ("compact bfs", graph.get_pkg_rdep_chain(root, order="bfs")),
+        ("dict dfs depth 8", rdep_chain.get_pkg_rdep_chain(root, max_depth=8)),
+    ]:
+        seconds, count = timed(chain)
+        print(f"{name:>18} {count:>8} packages {seconds*1e3:>10.1f} ms")
+
+    limit = min(nodes, 5000)
+    small = synthetic_dependees(limit, fanout)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4*limit))
+    seconds, count = timed(recursive_chain(small, root))
+    print(f"{'recursive':>18} {count:>8} packages {seconds*1e3:>10.1f} ms"
+        f" ({limit} package graph, list seen and recursion limit)")
+
+if __name__ == '__main__':
+    main()
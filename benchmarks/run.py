@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Time the parser and the graph on synthetic inputs and save the results as
+JSON, optionally comparing them with the results of an earlier run.
+
+    PYTHONPATH=. python benchmarks/run.py [--quick] [--output out.json] [--compare old.json]
+
+Run from the repository root, or with revdep installed and without
+`PYTHONPATH`.
+
+"""
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+from revdep.catpkg import CAUSAL_CHAIN_KINDS
+from revdep.depvar_parser import EbuildDepvarParser
+from revdep.rdep_chain import SystemReverseDependencyChain
+from revdep.tree import kind_key
+from synthetic import synthetic_depvar, synthetic_emerge_output
+
+DEPVAR_SIZES = [(10, 2), (50, 3), (200, 4)]
+GRAPH_SIZES = [1000, 10000, 100000]
+
+def best_of(repeat, function):
+    """
+    Return the fastest of `repeat` runs of `function` in seconds, and its
+    result.
+
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best: best = seconds
+    return best, result
+
+def allocated(function):
+    """
+    Return the bytes still allocated by the result of `function`.
+
+    """
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def bench_depvar(atoms, depth, repeat):
+    depvar = synthetic_depvar(atoms, depth)
+    def parse():
+        parser = EbuildDepvarParser(depvar)
+        parser.root()
+        return parser
+    kind = lambda t: t.data.kind
+    def traverse(tree, key=kind):
+        for _ in range(10):
+            for atom in tree.traverse_branches(["Atom"], key):
+                atom.traverse_branches(["CatPkg"], key)
+
+    def parse_packrat():
+        parser = EbuildDepvarParser(depvar, packrat=True)
+        parser.root()
+        return parser
+
+    def build():
+        parser = EbuildDepvarParser(depvar, builder=True)
+        parser.root()
+        return parser.to_tree()
+
+    def parse_kinds():
+        parser = EbuildDepvarParser(depvar, kinds=CAUSAL_CHAIN_KINDS)
+        parser.root()
+        return parser
+
+    root, parser = best_of(repeat, parse)
+    root_kinds, kinds_parser = best_of(repeat, parse_kinds)
+    root_packrat, packrat_parser = best_of(repeat, parse_packrat)
+    builder, _ = best_of(repeat, build)
+    to_tree, tree = best_of(repeat, parser.to_tree)
+    to_compact_tree, _ = best_of(repeat, parser.to_compact_tree)
+    traverse_branches, _ = best_of(repeat, lambda: traverse(tree))
+    traverse_kind_key, _ = best_of(repeat, lambda: traverse(tree, kind_key))
+    size = {"atoms": atoms, "depth": depth, "chars": len(depvar),
+        "parcels": len(parser.parcels)}
+    return {
+        f"root[{atoms}x{depth}]": {**size, "seconds": root, "bytes": allocated(parse)},
+        f"to_tree[{atoms}x{depth}]": {
+            **size, "seconds": to_tree, "bytes": allocated(parser.to_tree)},
+        f"to_compact_tree[{atoms}x{depth}]": {
+            **size, "seconds": to_compact_tree,
+            "bytes": allocated(parser.to_compact_tree)},
+        f"root_packrat[{atoms}x{depth}]": {
+            **size, "memo": len(packrat_parser._memo), "seconds": root_packrat,
+            "bytes": allocated(parse_packrat)},
+        f"root_builder[{atoms}x{depth}]": {**size, "seconds": builder},
+        f"root_causal_chain_kinds[{atoms}x{depth}]": {
+            **size, "parcels": len(kinds_parser.parcels), "seconds": root_kinds,
+            "bytes": allocated(parse_kinds)},
+        f"traverse_branches[{atoms}x{depth}]": {**size, "seconds": traverse_branches},
+        f"traverse_branches_kind_key[{atoms}x{depth}]": {
+            **size, "seconds": traverse_kind_key},
+    }
+
+def bench_graph(packages, repeat):
+    output = synthetic_emerge_output(packages)
+    lines = output.split("\n")
+    def find_dependees():
+        return SystemReverseDependencyChain(lines)
+    parse, rdep_chain = best_of(repeat, find_dependees)
+    # Ten packages pulled in by one new package each.
+    changed = list(lines)
+    for k in range(0, len(changed), len(changed)//10):
+        while not changed[k].startswith("    cat/"): k += 1
+        changed[k] = "    cat/new-1 requires cat/new"
+    update, _ = best_of(
+        repeat, lambda: SystemReverseDependencyChain.from_previous(rdep_chain, changed))
+    root = next(iter(rdep_chain.dependees_by_dependency))
+    chain, links = best_of(
+        repeat, lambda: sum(1 for _ in rdep_chain.get_pkg_rdep_chain(root)))
+    size = {"packages": packages, "lines": len(lines)}
+    return {
+        f"find_dependees[{packages}]": {**size, "seconds": parse},
+        f"from_previous[{packages}]": {**size, "changed": 10, "seconds": update},
+        f"get_pkg_rdep_chain[{packages}]": {**size, "links": links, "seconds": chain},
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--quick", action="store_true",
+        help="smaller inputs and fewer repeats")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--compare", type=Path,
+        help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    repeat = 1 if args.quick else args.repeat
+    depvar_sizes = DEPVAR_SIZES[:2] if args.quick else DEPVAR_SIZES
+    graph_sizes = GRAPH_SIZES[:2] if args.quick else GRAPH_SIZES
+    results = {}
+    for atoms, depth in depvar_sizes: results.update(bench_depvar(atoms, depth, repeat))
+    for packages in graph_sizes: results.update(bench_graph(packages, repeat))
+
+    previous = {}
+    if args.compare: previous = json.loads(args.compare.read_text())["results"]
+    for name, result in results.items():
+        line = f"{name:>38} {result['seconds']*1e3:>10.3f} ms"
+        if "bytes" in result: line += f" {result['bytes']:>10} B"
+        if name in previous:
+            line += f" {result['seconds']/previous[name]['seconds']:>7.2f}x"
+        print(line)
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "repeat": repeat,
+            "results": results,
+        }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Generators of synthetic inputs for the benchmarks: depvars and `emerge
+--pretend --verbose --emptytree --depclean` outputs of a configurable size.
+Generation is seeded, so a size always gives the same input.
+
+The grammar does not parse a version followed by a slot or USE
+dependencies, `flag=` or `!flag?` USE dependencies next to another one,
+nor anything but atoms and `( )` groups inside a `||`/`^^`/`??` group, so
+none of these is generated.
+
+"""
+import random
+
+CATEGORIES = ["app-misc", "dev-libs", "dev-lang", "sys-libs", "x11-libs", "media-libs"]
+USE_FLAGS = ["X", "wayland", "ssl", "doc", "test", "python_targets_python3_12", "icu"]
+GROUPS = ["||", "^^", "??"]
+
+def _catpkg(rng, packages=500):
+    return f"{rng.choice(CATEGORIES)}/pkg{rng.randrange(packages)}"
+
+def synthetic_atom(rng):
+    """
+    Return a random atom: blocked, versioned, slotted or with USE
+    dependencies.
+
+    """
+    catpkg = _catpkg(rng)
+    kind = rng.randrange(6)
+    if kind == 0: return catpkg
+    if kind == 1:
+        operator = rng.choice([">=", "<=", "=", "~", ">", "<"])
+        version = ".".join(str(rng.randrange(10)) for _ in range(rng.randint(1, 3)))
+        suffix = rng.choice(["", "_rc1", "_p2", "-r1", "_beta3-r2"])
+        return f"{operator}{catpkg}-{version}{suffix}"
+    if kind == 2:
+        slot = rng.choice([":0", ":2", ":0/1.2", ":=", ":*", ":3="])
+        return f"{catpkg}{slot}"
+    if kind == 3:
+        flags = rng.sample(USE_FLAGS, rng.randint(1, 3))
+        forms = ["{}", "-{}", "{}?"]
+        if len(flags) == 1: forms += ["!{}?", "{}=", "!{}="]
+        flags = [rng.choice(forms).format(flag) for flag in flags]
+        return f"{catpkg}[{','.join(flags)}]"
+    if kind == 4:
+        return f"{catpkg}:{rng.randrange(5)}[{rng.choice(USE_FLAGS)}]"
+    return f"{rng.choice(['!', '!!'])}{catpkg}"
+
+def synthetic_depvar(atoms=50, depth=3, seed=0):
+    """
+    Return a depvar of about `atoms` atoms with `||`/`^^`/`??` groups and
+    `use? ( )` conditionals nested up to `depth` levels.
+
+    """
+    rng = random.Random(seed)
+    def items(count, level, in_group=False):
+        out = []
+        while count > 0:
+            roll = rng.random()
+            if level < depth and count > 2 and roll < 0.3:
+                size = rng.randint(2, min(count, 6))
+                if in_group: group = ""
+                elif roll < 0.15: group = rng.choice(GROUPS)
+                else: group = rng.choice(["", "!"]) + rng.choice(USE_FLAGS) + "?"
+                nested = items(size, level+1, in_group or group in GROUPS)
+                out.append(f"{group} ( {' '.join(nested)} )".lstrip())
+                count -= size
+            else:
+                out.append(synthetic_atom(rng))
+                count -= 1
+        return out
+    return " ".join(items(atoms, 0))
+
+def synthetic_dependees(packages, fanout=3, window=50, seed=0):
+    """
+    Return a `dependees_by_dependency` of `packages` packages, each pulled in
+    by `fanout` random packages among the next `window`, the last one by
+    `@selected`.
+
+    """
+    rng = random.Random(seed)
+    dependees = {}
+    for i in range(packages):
+        later = range(i+1, min(i+1+window, packages))
+        picks = rng.sample(later, min(fanout, len(later)))
+        dependees[f"cat/pkg{i}-1"] = [f"cat/pkg{j}-1" for j in picks] or ["@selected"]
+    return dependees
+
+def synthetic_emerge_output(packages, fanout=3, window=50, seed=0):
+    """
+    Return an emerge --depclean output with a "pulled in by:" section for
+    each package of `synthetic_dependees`.
+
+    """
+    dependees = synthetic_dependees(packages, fanout, window, seed)
+    lines = ["", "Calculating dependencies  ... done!"]
+    for pkgname, pulled_in_by in dependees.items():
+        lines.append(f"  {pkgname} pulled in by:")
+        for dependee in pulled_in_by:
+            if dependee.startswith("@"): lines.append(f"    {dependee}")
+            else: lines.append(f"    {dependee} requires {pkgname.rsplit('-', 1)[0]}")
+        lines.append("")
+    lines.append(">>> No packages selected for removal by depclean")
+    return "\n".join(lines) + "\n"
@@ -1,25 +1,106 @@
 #!/usr/bin/env python
 
+import argparse
+import sys
 from pathlib import Path
+from . import depvars
 from .atom_causal_chain import AtomCausalChain
+from .batch import read_queries, run_batch
+from .sweep import sweep, write_jsonl
+from .cache import DepvarCache
+from .parser_stats import ParserStats
 from .user_interface import prompt_pkgname
-from .rdep_chain import SystemReverseDependencyChain
+from .rdep_chain import SystemReverseDependencyChain, run_emerge
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="revdep",
+        description="Print why packages are pulled in. Without queries the "
+        "package is prompted for.")
+    parser.add_argument(
+        "queries", nargs="*", metavar="QUERY",
+        help="package name or regex, every matching package is answered")
+    parser.add_argument(
+        "-f", "--file", action="append", default=[],
+        help="read queries from a file, one per line, '-' for stdin")
+    parser.add_argument(
+        "--all", action="store_true",
+        help="print the causal chain of every package as JSON lines, computed "
+        "by --jobs processes")
+    parser.add_argument(
+        "--emerge-output", type=Path,
+        default=Path(__file__).parent / "emerge_rdeps.txt",
+        help="output of `emerge --pretend --verbose --emptytree --depclean`")
+    parser.add_argument(
+        "--run-emerge", action="store_true",
+        help="run `emerge --pretend --verbose --emptytree --depclean` and read "
+        "its output as it is printed instead of --emerge-output")
+    parser.add_argument(
+        "--root",
+        help="read depvars from the metadata below this root instead of portage")
+    parser.add_argument(
+        "-j", "--jobs", type=int,
+        help="fetch and parse depvars on this many threads, or processes "
+        "with --all")
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="do not use the persistent depvar cache")
+    parser.add_argument(
+        "--refresh-cache", action="store_true",
+        help="fetch the depvars of every package again, the parse trees of "
+        "unchanged depvars are still reused from the cache")
+    parser.add_argument(
+        "--parser-stats", action="store_true",
+        help="print the time and calls of every grammar rule to stderr, "
+        "depvars found in the cache are not parsed, single-threaded only")
+    args = parser.parse_args(argv)
+    if args.parser_stats and (args.all or (args.jobs or 1) > 1):
+        parser.error("--parser-stats cannot be used with --all or --jobs")
+    return args
+
+def main(argv=None):
     # emerge --pretend --verbose --emptytree --depclean > emerge_deps.txt
     # portageq metadata / ebuild <PKG> DEPEND
+    args = parse_args(argv)
+
+    if args.run_emerge:
+        rdep_chain = SystemReverseDependencyChain(run_emerge())
+    else:
+        with open(args.emerge_output) as emerge_rdeps_file:
+            rdep_chain = SystemReverseDependencyChain(emerge_rdeps_file)
+    if args.all:
+        write_jsonl(sweep(rdep_chain, jobs=args.jobs, root=args.root), sys.stdout)
+        return 0
 
-    emerge_rdeps_filename = "./emerge_rdeps.txt"
-    emerge_rdeps_filepath = Path(__file__).parent / emerge_rdeps_filename
-    emerge_rdeps_file = open(emerge_rdeps_filepath)
-    emerge_rdeps_output = emerge_rdeps_file.read()
-    rdep_chain = SystemReverseDependencyChain(emerge_rdeps_output)
+    queries = list(args.queries)
+    for filename in args.file:
+        if filename == "-":
+            queries += read_queries(sys.stdin)
+            continue
+        with open(filename) as f: queries += read_queries(f)
 
-    pkgname = prompt_pkgname(pkgnames=rdep_chain.dependees_by_dependency.keys())
-    causal_chain = AtomCausalChain(rdep_chain=rdep_chain, pkgname=pkgname)
-    links = causal_chain.causal_chain
-    for link in links:
-        print(link)
+    parser_stats = ParserStats() if args.parser_stats else None
+    cache = None
+    if not args.no_cache:
+        cache = DepvarCache(max_age=0) if args.refresh_cache else DepvarCache()
+    if args.root is not None: worker = depvars.MetadataReader(root=args.root)
+    else: worker = depvars.PortageqWorker(processes=args.jobs or 1)
+    try:
+        if queries:
+            return 1 if run_batch(
+                rdep_chain, queries, worker, cache, args.jobs,
+                parser_stats=parser_stats) else 0
+        pkgname = prompt_pkgname(pkgnames=rdep_chain.dependees_by_dependency.keys())
+        causal_chain = AtomCausalChain(
+            rdep_chain=rdep_chain, pkgname=pkgname, worker=worker, cache=cache,
+            jobs=args.jobs, parser_stats=parser_stats)
+        links = causal_chain.causal_chain
+        for link in links:
+            print(link)
+    finally:
+        worker.close()
+        if cache is not None: cache.close()
+        if parser_stats is not None: print(parser_stats, file=sys.stderr)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
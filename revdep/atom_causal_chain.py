@@ -1,4 +1,9 @@
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from .depvar_parser import EbuildDepvarParser
+from .catpkg import (
+    get_catpkg, build_catpkg_index, get_reasons, CAUSAL_CHAIN_KINDS)
 from . import depvars
 
 class CausalLink:
@@ -13,6 +18,15 @@ class CausalLink:
     def add_item(self, depvar_name, cause):
         self.items.append((depvar_name, cause,))
 
+    def to_dict(self):
+        return {
+            "level": self.level,
+            "pkgname": self.pkgname,
+            "items": [
+                {"depvar": depvar_name, "cause": cause}
+                for depvar_name,cause in self.items],
+        }
+
     def __repr__(self):
         level = self.level
         out = f"{'    '*level}{self.pkgname} ,{self.pkgname}\n"
@@ -23,62 +37,159 @@ class CausalLink:
 class AtomCausalChain:
     """
     Provides the causal chain for a given package name from the full system
-    reverse dependency chain. 
+    reverse dependency chain. Depvars are fetched through `worker` (see
+    `depvars.PortageqWorker`), a worker started by the chain by default.
+    Depvars are parsed keeping only `catpkg.CAUSAL_CHAIN_KINDS`. Fetched
+    depvars and their trees are kept in `cache` if given (see
+    `cache.DepvarCache`), depvars until the `metadata_key` of the worker
+    changes. With `jobs`, depvars of the upcoming packages of the
+    chain are fetched and parsed by that many threads ahead of the link being
+    checked, links are still yielded in chain order. `async_causal_chain` is
+    the asyncio counterpart of `causal_chain`. A `memo` dictionary shared by
+    several chains keeps the catpkg indexes of every package loaded in memory,
+    so packages common to the chains are loaded once. Depvars are parsed with
+    `parser_stats` (see `parser_stats.ParserStats`) if given.
 
     """
-    def __init__(self, rdep_chain, pkgname):
+    def __init__(self, rdep_chain, pkgname, worker=None, cache=None, jobs=None,
+        memo=None, parser_stats=None):
         self.pkgname = pkgname
+        self.worker = worker
+        self.cache = cache
+        self.jobs = jobs
+        self.memo = memo
+        self.parser_stats = parser_stats
         self.pkg_rdep_chain = list(rdep_chain.get_pkg_rdep_chain(self.pkgname))
         self.causal_chain = self._get_causal_chain()
 
     def _get_atom_pkgname(self, atom):
-        x = lambda t: t.data.kind
-        p = EbuildDepvarParser(atom)
+        return get_catpkg(atom)
+
+    def _get_depvars(self, worker, pkgname):
+        if self.cache is None: return worker.get_depvars(pkgname)
+        key = worker.metadata_key(pkgname)
+        pkg_depvars = self.cache.get_depvars(pkgname, key)
+        if pkg_depvars is None:
+            pkg_depvars = worker.get_depvars(pkgname)
+            self.cache.put_depvars(pkgname, pkg_depvars, key)
+        return pkg_depvars
+
+    def _get_catpkg_index(self, pkgname, depvar_name, depvar):
+        if self.cache is not None:
+            index = self.cache.get_catpkg_index(pkgname, depvar_name, depvar)
+            if index is not None: return index
+        p = EbuildDepvarParser(
+            depvar, stats=self.parser_stats, kinds=CAUSAL_CHAIN_KINDS)
         p.root()
-        t = p.to_tree()
-        pkg = t.traverse_branches(["Atom", "CatPkg"], x)[0].data.value
-        pkg = pkg.strip()
-        return pkg
-
-    def _check_for_atom(self, tree, pkg, prefix=[]):
-        x = lambda t: t.data.kind
-        pkg = self._get_atom_pkgname(pkg)
-        reasons = []
-        potential_reasons = []
-
-        atoms = tree.traverse_branches(["Atom"], x)
-        any_of_groups = tree.traverse_branches(["AnyOfGroup"], x)
-        exactly_one_of_groups = tree.traverse_branches(["ExactlyOneOfGroup"], x)
-        most_one_of_groups = tree.traverse_branches(["MostOneOfGroup"], x)
-        dynamic_uses = tree.traverse_branches(["DynamicUse"], x)
-        empty_groups = tree.traverse_branches(["PseudoGroup"], x)
-
-        pkgnames = []
-        for b in atoms:
-            pkgname = b.traverse_branches(["CatPkg"], x)
-            if len(pkgname) > 1: raise Exception
-            pkgname = pkgname[0].data.value
-            pkgname = self._get_atom_pkgname(pkgname)
-            pkgnames.append(pkgname)
-        potential_reasons += prefix+[pkg]
-        if pkg in pkgnames:
-            reasons += prefix+[pkg]
-
-        for b in any_of_groups:
-            reasons += self._check_for_atom(b, pkg, prefix+["||"])
-        for b in exactly_one_of_groups:
-            reasons += self._check_for_atom(b, pkg, prefix+["^^"])
-        for b in most_one_of_groups:
-            reasons += self._check_for_atom(b, pkg, prefix+["??"])
-
-        for b in dynamic_uses:
-            use_query = b.traverse_branches(["UseQuery"], x)
-            if len(use_query) > 1: raise Exception
-            use_query = use_query[0].data.value
-            reasons += self._check_for_atom(b, pkg, prefix+[use_query])
-        return(reasons)
+        tree = p.to_tree()
+        index = build_catpkg_index(tree)
+        if self.cache is not None:
+            self.cache.put_tree(pkgname, depvar_name, depvar, tree, index)
+        return index
+
+    def _get_catpkg_indexes(self, pkgname, pkg_depvars):
+        depvar_names = depvars.depvar_names.split(" ")
+        return [
+            (depvar_name, self._get_catpkg_index(pkgname, depvar_name, depvar))
+            for depvar_name, depvar in zip(depvar_names, pkg_depvars)]
+
+    def _load(self, worker, pkgname):
+        if self.memo is not None and pkgname in self.memo:
+            return self.memo[pkgname]
+        indexes = self._get_catpkg_indexes(
+            pkgname, self._get_depvars(worker, pkgname))
+        if self.memo is not None: self.memo[pkgname] = indexes
+        return indexes
+
+    def _load_all(self, worker, pkgnames):
+        if not self.jobs:
+            for pkgname in pkgnames: yield self._load(worker, pkgname)
+            return
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            pending = collections.deque()
+            for pkgname in pkgnames:
+                pending.append(executor.submit(self._load, worker, pkgname))
+                if len(pending) > 2*self.jobs: yield pending.popleft().result()
+            while pending: yield pending.popleft().result()
+
+    async def _get_depvars_async(self, pkgname, semaphore):
+        if self.worker is None:
+            return await depvars.get_depvars_async(pkgname, semaphore)
+        async with semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.worker.get_depvars, pkgname)
+
+    def _get_cached_depvars(self, pkgname):
+        if self.worker is None: key = depvars.metadata_key(pkgname)
+        else: key = self.worker.metadata_key(pkgname)
+        return self.cache.get_depvars(pkgname, key), key
+
+    async def _load_async(self, pkgname, semaphore):
+        if self.memo is not None and pkgname in self.memo:
+            return self.memo[pkgname]
+        loop = asyncio.get_running_loop()
+        pkg_depvars = None
+        if self.cache is not None:
+            pkg_depvars, key = await loop.run_in_executor(
+                None, self._get_cached_depvars, pkgname)
+        if pkg_depvars is None:
+            pkg_depvars = await self._get_depvars_async(pkgname, semaphore)
+            if self.cache is not None:
+                await loop.run_in_executor(
+                    None, self.cache.put_depvars, pkgname, pkg_depvars, key)
+        indexes = await loop.run_in_executor(
+            None, self._get_catpkg_indexes, pkgname, pkg_depvars)
+        if self.memo is not None: self.memo[pkgname] = indexes
+        return indexes
+
+    async def async_causal_chain(self, jobs=8):
+        """
+        Yield the causal links like `causal_chain`, fetching the depvars of all
+        packages of the chain concurrently on the running event loop with at
+        most `jobs` portageq processes at a time, or through `worker` on at
+        most `jobs` threads if given. Each link is yielded as soon as its
+        metadata and the metadata of the links before it arrived. Metadata
+        keys, cache lookups and parsing run on the default executor of the
+        loop, not on the loop itself.
+
+        """
+        pkg_rdep_chain = list(self.pkg_rdep_chain)
+        semaphore = asyncio.BoundedSemaphore(jobs)
+        loading = {
+            pkgname: asyncio.ensure_future(self._load_async(pkgname, semaphore))
+            for level,pkgname in pkg_rdep_chain[1:]
+            if pkgname != "@selected"}
+        try:
+            levels = {}
+            level,root = pkg_rdep_chain.pop(0)
+            levels[level] = self._get_atom_pkgname(root)
+            yield CausalLink(level,root)
+            for level,pkgname in pkg_rdep_chain:
+                link = CausalLink(level,pkgname)
+                if pkgname == "@selected":
+                    yield(link)
+                    continue
+                self._add_causes(link, levels, await loading[pkgname])
+                yield(link)
+        finally:
+            for future in loading.values(): future.cancel()
+
+    def _add_causes(self, link, levels, indexes):
+        levels[link.level] = self._get_atom_pkgname(link.pkgname)
+        for depend_var,index in indexes:
+            cause = get_reasons(index, levels[link.level-1])
+            if not cause:
+                continue
+            link.add_item(depend_var,cause)
 
     def _get_causal_chain(self):
+        if self.worker is not None:
+            yield from self._get_links(self.worker)
+            return
+        with depvars.PortageqWorker(processes=self.jobs or 1) as worker:
+            yield from self._get_links(worker)
+
+    def _get_links(self, worker):
         pkg_rdep_chain = self.pkg_rdep_chain
 
         levels = {}
@@ -89,19 +200,13 @@ class AtomCausalChain:
         pkgname = root
         link = CausalLink(level,root)
         yield(link)
+        loaded = self._load_all(worker, [
+            pkgname for level,pkgname in pkg_rdep_chain
+            if pkgname != "@selected"])
         for level,pkgname in pkg_rdep_chain:
             link = CausalLink(level,pkgname)
             if pkgname == "@selected":
                 yield(link)
                 continue
-            pkg_depvars = depvars.get_depvars(pkgname)
-            levels[level] = self._get_atom_pkgname(pkgname)
-            for depend_var,depend_str in zip(depvars.depvar_names.split(" "),pkg_depvars):
-                p = EbuildDepvarParser(depend_str)
-                p.root()
-                tree = p.to_tree()
-                cause = self._check_for_atom(tree, levels[level-1])
-                if not cause:
-                    continue
-                link.add_item(depend_var,cause)
+            self._add_causes(link, levels, next(loaded))
             yield(link)
@@ -0,0 +1,65 @@
+import re
+import sys
+import time
+from .atom_causal_chain import AtomCausalChain
+
+def read_queries(lines):
+    """
+    Yield the queries of a file or stdin, one per line. Blank lines and lines
+    starting with `#` are skipped.
+
+    """
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"): yield(line)
+
+def match_pkgnames(query, pkgnames):
+    """
+    Return the package names a query stands for: the package itself if it is
+    one, else every package name the query (a regex) matches, sorted.
+
+    """
+    if query in pkgnames: return [query]
+    try:
+        regex = re.compile(query)
+    except re.error:
+        raise Exception(f"Invalid regex {query}.")
+    return sorted(pkgname for pkgname in pkgnames if regex.search(pkgname))
+
+def run_batch(rdep_chain, queries, worker, cache=None, jobs=None,
+    out=None, err=None, parser_stats=None):
+    """
+    Print the causal chain of every package matched by the queries. The
+    graph, `worker`, `cache` and the catpkg indexes loaded for one chain are
+    shared by all of them. The time taken by each query is printed to `err`,
+    stderr by default, and so are invalid regexes, which are skipped. Return
+    the number of queries matching no package, invalid ones included.
+
+    """
+    if out is None: out = sys.stdout
+    if err is None: err = sys.stderr
+    pkgnames = rdep_chain.dependees_by_dependency.keys()
+    memo = {}
+    unmatched = 0
+    for query in queries:
+        start = time.perf_counter()
+        try:
+            matched = match_pkgnames(query, pkgnames)
+        except Exception as error:
+            print(f"# {query}: {error}", file=err)
+            unmatched += 1
+            continue
+        if not matched: unmatched += 1
+        links = 0
+        for pkgname in matched:
+            causal_chain = AtomCausalChain(
+                rdep_chain=rdep_chain, pkgname=pkgname, worker=worker,
+                cache=cache, jobs=jobs, memo=memo, parser_stats=parser_stats)
+            for link in causal_chain.causal_chain:
+                print(link, file=out)
+                links += 1
+        seconds = time.perf_counter() - start
+        print(
+            f"# {query}: {len(matched)} packages, {links} links, {seconds:.3f}s",
+            file=err)
+    return unmatched
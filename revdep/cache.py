@@ -0,0 +1,154 @@
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from .tree import Tree
+from .parcel import Parcel
+
+# Bump when the tables change, older caches are dropped.
+SCHEMA_VERSION = 4
+
+# Seconds after which fetched depvars are fetched again, see `DepvarCache`.
+DEFAULT_MAX_AGE = 7*24*3600
+
+def default_cache_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "revdep" / "depvars.sqlite"
+
+class DepvarCache:
+    """
+    Persistent sqlite cache of the depvars fetched for a package CPV and of
+    their parse trees and catpkg indexes (see `catpkg.build_catpkg_index`).
+    Depvars are stored with the key of the metadata they were fetched from
+    (see `depvars.metadata_key`) and only returned for that key, and for
+    `max_age` seconds at most, 0 to fetch everything again. A tree is stored
+    with the hash of the depvar it was parsed from and only returned for that
+    depvar, so a changed depvar is a miss and its tree gets replaced. Each
+    table keeps at most `max_entries` rows, evicting the least recently used.
+    `hits` and `misses` count lookups per table. Thread-safe.
+
+    """
+    def __init__(self, path=None, max_entries=50000, max_age=DEFAULT_MAX_AGE):
+        if path is None: path = default_cache_path()
+        if str(path) != ":memory:": Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._db.executescript(f"""
+                DROP TABLE IF EXISTS depvars;
+                DROP TABLE IF EXISTS trees;
+                PRAGMA user_version = {SCHEMA_VERSION};
+            """)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS depvars (
+                cpv TEXT PRIMARY KEY, key TEXT, fetched REAL, depvars TEXT,
+                used INTEGER);
+            CREATE TABLE IF NOT EXISTS trees (
+                cpv TEXT, name TEXT, digest TEXT, tree TEXT,
+                catpkg_index TEXT, used INTEGER,
+                PRIMARY KEY (cpv, name));
+        """)
+        self._clock = self._db.execute(
+            "SELECT MAX(used) FROM (SELECT used FROM depvars "
+            "UNION ALL SELECT used FROM trees)").fetchone()[0] or 0
+
+    def get_depvars(self, cpv, key=None):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT depvars FROM depvars "
+                "WHERE cpv = ? AND key IS ? AND fetched >= ?",
+                (cpv, key, time.time() - self.max_age)).fetchone()
+            if row is None:
+                self.misses["depvars"] += 1
+                return None
+            self.hits["depvars"] += 1
+            self._touch("depvars", "cpv = ?", (cpv,))
+            return json.loads(row[0])
+
+    def put_depvars(self, cpv, depvars, key=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO depvars VALUES (?, ?, ?, ?, ?)",
+                (cpv, key, time.time(), json.dumps(depvars), self._tick()))
+            self._evict("depvars")
+
+    def get_tree(self, cpv, name, depvar):
+        row = self._get_row("tree", cpv, name, depvar)
+        if row is None: return None
+        return _load_tree(json.loads(row), depvar)
+
+    def get_catpkg_index(self, cpv, name, depvar):
+        row = self._get_row("catpkg_index", cpv, name, depvar)
+        if row is None: return None
+        return json.loads(row)
+
+    def put_tree(self, cpv, name, depvar, tree, catpkg_index=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO trees VALUES (?, ?, ?, ?, ?, ?)",
+                (cpv, name, _digest(depvar), json.dumps(_dump_tree(tree)),
+                json.dumps(catpkg_index), self._tick()))
+            self._evict("trees")
+
+    def _get_row(self, column, cpv, name, depvar):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {column} FROM trees "
+                "WHERE cpv = ? AND name = ? AND digest = ?",
+                (cpv, name, _digest(depvar))).fetchone()
+            if row is None or row[0] == "null":
+                self.misses["trees"] += 1
+                return None
+            self.hits["trees"] += 1
+            self._touch("trees", "cpv = ? AND name = ?", (cpv, name))
+            return row[0]
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def _touch(self, table, where, args):
+        self._db.execute(
+            f"UPDATE {table} SET used = ? WHERE {where}", (self._tick(), *args))
+
+    def _evict(self, table):
+        count = self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if count <= self.max_entries: return
+        self._db.execute(
+            f"DELETE FROM {table} WHERE rowid IN "
+            f"(SELECT rowid FROM {table} ORDER BY used LIMIT ?)",
+            (count - self.max_entries,))
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
+
+def _digest(depvar):
+    return hashlib.sha1(depvar.encode()).hexdigest()
+
+def _dump_tree(tree):
+    data = tree.data
+    return [
+        data.kind, data.index_start, data.index_end,
+        [_dump_tree(b) for b in tree.branches]]
+
+def _load_tree(dumped, depvar):
+    kind, start, end, branches = dumped
+    tree = Tree(Parcel(start, end, None, kind, depvar))
+    for b in branches:
+        tree.add_branch(_load_tree(b, depvar))
+    return tree
@@ -0,0 +1,71 @@
+import functools
+from .depvar_parser import EbuildDepvarParser
+
+@functools.lru_cache(maxsize=4096)
+def get_catpkg(atom):
+    """
+    Return the `cat/pkg` of an atom (e.g. `>=dev-libs/glib-2.78:2` gives
+    `dev-libs/glib`). Only the rules an atom starts with are parsed and no tree
+    is built. Results are kept in a bounded LRU cache, `get_catpkg.cache_info()`
+    reports its hits and misses.
+
+    """
+    parser = EbuildDepvarParser(atom, lexer=True)
+    parser.block()
+    parser.ver_gate()
+    parser.catpkg()
+    if not parser.parcels or parser.parcels[-1].kind != "CatPkg":
+        raise Exception(f"No CatPkg in atom {atom}.")
+    return parser.parcels[-1].value.strip()
+
+# The kinds `build_catpkg_index` reads, with the groups holding them, enough
+# to parse depvars for a causal chain (see `EbuildDepvarParser` `kinds`).
+CAUSAL_CHAIN_KINDS = frozenset([
+    "Root", "Atom", "CatPkg", "AllOfGroup", "AnyOfGroup", "ExactlyOneOfGroup",
+    "MostOneOfGroup", "DynamicUse", "UseQuery",
+])
+
+_GROUP_PREFIXES = [
+    ("AnyOfGroup", "||"),
+    ("ExactlyOneOfGroup", "^^"),
+    ("MostOneOfGroup", "??"),
+]
+
+def build_catpkg_index(tree, prefix=[], index=None):
+    """
+    Return the `cat/pkg` of every atom in a depvar tree mapped to the list of
+    group symbols and USE queries leading to it, one list per group holding
+    the atom. Built in one pass, ordered like `AtomCausalChain` reports the
+    reasons for a package, so these become a lookup (see `get_reasons`).
+
+    """
+    if index is None: index = {}
+    catpkgs = []
+    for b in tree.get_branches("Atom"):
+        catpkg = b.get_branches("CatPkg")
+        if len(catpkg) > 1: raise Exception
+        catpkg = get_catpkg(catpkg[0].data.value)
+        if catpkg not in catpkgs: catpkgs.append(catpkg)
+    for catpkg in catpkgs:
+        index.setdefault(catpkg, []).append(prefix)
+
+    for kind, symbol in _GROUP_PREFIXES:
+        for b in tree.get_branches(kind):
+            build_catpkg_index(b, prefix+[symbol], index)
+    for b in tree.get_branches("DynamicUse"):
+        use_query = b.get_branches("UseQuery")
+        if len(use_query) > 1: raise Exception
+        build_catpkg_index(b, prefix+[use_query[0].data.value], index)
+    return index
+
+def get_reasons(catpkg_index, atom):
+    """
+    Return the group symbols and USE queries leading to each atom of a
+    package in a depvar, each followed by the package's `cat/pkg`.
+
+    """
+    catpkg = get_catpkg(atom)
+    reasons = []
+    for prefix in catpkg_index.get(catpkg, []):
+        reasons += prefix+[catpkg]
+    return reasons
@@ -0,0 +1,163 @@
+import json
+from array import array
+from .compact_graph import CompactRdepGraph
+
+# Bump when the saved layout changes.
+FORMAT_VERSION = 1
+
+class ReachabilityIndex:
+    """
+    The transitive closure of a reverse dependency graph, built once to
+    answer "what transitively pulls in a package" and "does one package pull
+    in another" without walking the graph.
+
+    Packages pulling each other in (strongly connected components) share one
+    entry. Each component holds a bitset, a Python int with bit `i` set when
+    package id `i` transitively pulls in its packages. Building costs an
+    iterative Tarjan pass, O(packages + edges), plus one bitset union per edge
+    between components, O(edges * packages / 64) word operations. The bitsets
+    take at most components * packages / 8 bytes, about 30 KB for the 725
+    packages of `emerge_rdeps.txt` but up to 1.25 GB for 100k packages that
+    do not pull each other in, see `memory_usage`. `reaches` tests one bit,
+    `closure` lists the set bits.
+
+    """
+    def __init__(self, names, components, closures):
+        self.names = names
+        self.components = components
+        self.closures = closures
+        self._ids = {name: i for i, name in enumerate(names)}
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Build the index of a `SystemReverseDependencyChain` or
+        `CompactRdepGraph`.
+
+        """
+        if not isinstance(graph, CompactRdepGraph): graph = graph.compact()
+        count = len(graph.names)
+        get_dependee_ids = graph.get_dependee_ids
+
+        # Iterative Tarjan. A component is complete once everything it pulls
+        # in is, so closures are built in the order components are found.
+        unvisited = count
+        index = array("I", [unvisited])*count
+        lowlink = array("I", [0])*count
+        on_stack = bytearray(count)
+        components = array("I", [0])*count
+        closures = []
+        stack = []
+        visited = 0
+        for start in range(count):
+            if index[start] != unvisited: continue
+            index[start] = lowlink[start] = visited
+            visited += 1
+            stack.append(start)
+            on_stack[start] = 1
+            work = [(start, iter(get_dependee_ids(start)))]
+            while work:
+                node, dependees = work[-1]
+                for dependee in dependees:
+                    if index[dependee] == unvisited:
+                        index[dependee] = lowlink[dependee] = visited
+                        visited += 1
+                        stack.append(dependee)
+                        on_stack[dependee] = 1
+                        work.append((dependee, iter(get_dependee_ids(dependee))))
+                        break
+                    if on_stack[dependee]:
+                        lowlink[node] = min(lowlink[node], index[dependee])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        closures.append(
+                            cls._close_component(node, stack, on_stack,
+                            components, closures, get_dependee_ids))
+        return cls(graph.names, components, closures)
+
+    @staticmethod
+    def _close_component(root, stack, on_stack, components, closures,
+        get_dependee_ids):
+        component = len(closures)
+        members = []
+        while True:
+            node = stack.pop()
+            on_stack[node] = 0
+            components[node] = component
+            members.append(node)
+            if node == root: break
+
+        closure = 0
+        cyclic = len(members) > 1
+        for node in members:
+            for dependee in get_dependee_ids(node):
+                other = components[dependee]
+                if other == component: cyclic = True
+                else: closure |= closures[other] | 1 << dependee
+        if cyclic:
+            for node in members: closure |= 1 << node
+        return closure
+
+    def get_closure_bits(self, pkgname):
+        """
+        Return the bitset of package ids transitively pulling in a package.
+
+        """
+        if pkgname not in self._ids: return 0
+        return self.closures[self.components[self._ids[pkgname]]]
+
+    def closure(self, pkgname):
+        """
+        Return every package transitively pulling in a package, the packages
+        of its `get_pkg_rdep_chain` below level 0, in id order. The package
+        itself is included only if it pulls itself in through a cycle.
+
+        """
+        names = self.names
+        bits = bin(self.get_closure_bits(pkgname))[:1:-1]
+        return [names[i] for i, bit in enumerate(bits) if bit == "1"]
+
+    def reaches(self, pkgname, dependee):
+        """
+        Return whether `dependee` transitively pulls in `pkgname`.
+
+        """
+        if dependee not in self._ids: return False
+        return bool(self.get_closure_bits(pkgname) >> self._ids[dependee] & 1)
+
+    def memory_usage(self):
+        """
+        Return the approximate number of bytes held by the closures.
+
+        """
+        return (
+            sum((closure.bit_length()+7)//8 for closure in self.closures)
+            + self.components.itemsize*len(self.components))
+
+    def save(self, path):
+        """
+        Write the index as JSON, e.g. next to the emerge output it was built
+        from. Bitsets are stored as hex strings.
+
+        """
+        with open(path, "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "names": self.names,
+                "components": list(self.components),
+                "closures": [format(closure, "x") for closure in self.closures],
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f: saved = json.load(f)
+        if saved.get("version") != FORMAT_VERSION:
+            raise Exception(f"Unsupported reachability index version in {path}.")
+        return cls(
+            saved["names"],
+            array("I", saved["components"]),
+            [int(closure, 16) for closure in saved["closures"]])
@@ -0,0 +1,98 @@
+import sys
+from array import array
+from collections.abc import Mapping
+from .traversal import walk_rdep_chain
+
+class CompactRdepGraph(Mapping):
+    """
+    A read-only `dependees_by_dependency` with every package name interned
+    once and mapped to an integer id. The dependees of all packages are kept
+    CSR-style in two arrays: the ids in `targets[offsets[i]:offsets[i+1]]` are
+    the dependees of package id `i`. Behaves like the dictionary of lists it
+    is built from and like a `SystemReverseDependencyChain` for queries.
+    `checksum` is the digest of the emerge output it was built from, if known.
+
+    """
+    def __init__(self, names, offsets, targets, checksum=None):
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+        self.checksum = checksum
+        self._ids = {name: i for i, name in enumerate(names)}
+        self._is_group = bytearray(name.startswith("@") for name in names)
+        self._len = sum(
+            1 for i in range(len(names)) if offsets[i] < offsets[i+1])
+
+    @classmethod
+    def from_dependees(cls, dependees_by_dependency, checksum=None):
+        ids = {}
+        names = []
+        def intern(name):
+            if name not in ids:
+                ids[name] = len(names)
+                names.append(sys.intern(name))
+            return ids[name]
+
+        # Dependencies first so the mapping keeps the dictionary's key order.
+        for dependency in dependees_by_dependency: intern(dependency)
+        adjacency = [
+            [intern(dependee) for dependee in dependees]
+            for dependees in dependees_by_dependency.values()]
+
+        offsets = array("I", [0])
+        targets = array("I")
+        for i in range(len(names)):
+            if i < len(adjacency): targets.extend(adjacency[i])
+            offsets.append(len(targets))
+        return cls(names, offsets, targets, checksum)
+
+    @property
+    def dependees_by_dependency(self): return self
+
+    def get_id(self, pkgname):
+        return self._ids[pkgname]
+
+    def get_dependee_ids(self, pkg_id):
+        return self.targets[self.offsets[pkg_id]:self.offsets[pkg_id+1]]
+
+    def __getitem__(self, pkgname):
+        dependee_ids = self.get_dependee_ids(self._ids[pkgname])
+        if not dependee_ids: raise KeyError(pkgname)
+        return [self.names[i] for i in dependee_ids]
+
+    def __iter__(self):
+        offsets = self.offsets
+        for i, name in enumerate(self.names):
+            if offsets[i] < offsets[i+1]: yield name
+
+    def __len__(self): return self._len
+
+    def get_pkg_rdep_chain(self, pkgname, order="dfs", max_depth=None):
+        """
+        Yield (level, pkgname) for the reverse dependencies of a package like
+        `SystemReverseDependencyChain.get_pkg_rdep_chain`, walking integer ids.
+
+        """
+        names = self.names
+        if pkgname not in self._ids:
+            yield((0,pkgname,))
+            return
+        for level,pkg_id in walk_rdep_chain(
+            self._ids[pkgname],
+            self.get_dependee_ids,
+            self._is_group.__getitem__,
+            order=order,
+            max_depth=max_depth,
+        ):
+            yield((level,names[pkg_id],))
+
+    def memory_usage(self):
+        """
+        Return the approximate number of bytes held by the graph.
+
+        """
+        return (
+            sys.getsizeof(self.names) + sum(map(sys.getsizeof, self.names))
+            + sys.getsizeof(self._ids) + sys.getsizeof(self._is_group)
+            + self.offsets.itemsize*len(self.offsets)
+            + self.targets.itemsize*len(self.targets))
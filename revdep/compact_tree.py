@@ -0,0 +1,187 @@
+import threading
+from array import array
+from .tree import Tree
+from .parcel import Parcel
+
+# Kind names shared by every compact tree, a tree stores their ids.
+KINDS = []
+_KIND_IDS = {}
+_kinds_lock = threading.Lock()
+
+def kind_id(kind):
+    known = _KIND_IDS.get(kind)
+    if known is not None: return known
+    # Trees are built by several threads at once (see `AtomCausalChain`).
+    with _kinds_lock:
+        if kind not in _KIND_IDS:
+            KINDS.append(kind)
+            _KIND_IDS[kind] = len(KINDS) - 1
+        return _KIND_IDS[kind]
+
+class CompactTree:
+    """
+    A parse tree stored as parallel arrays indexed by node, in pre-order with
+    the root at 0: kind id (see `KINDS`), start and end index in `depvar`,
+    parent, first child and next sibling, -1 where there is none. Values are
+    sliced from `depvar` when read. About 22 bytes a node instead of a `Tree`
+    and a `Parcel` object each. `root` returns a `NodeView` that reads like
+    the `Tree` given by `EbuildDepvarParser.to_tree`.
+
+    """
+    def __init__(self, depvar):
+        self.depvar = depvar
+        self.kinds = array("H")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.parents = array("i")
+        self.first_children = array("i")
+        self.next_siblings = array("i")
+        # (parent, kind id) -> children, see `NodeView.get_branches`.
+        self._branches_by_kind = None
+
+    @classmethod
+    def from_parcels(cls, depvar, parcels):
+        """
+        Nest parcels like `EbuildDepvarParser.to_tree` does, keeping the
+        first root only.
+
+        """
+        tree = cls(depvar)
+        # Sort by last added if otherwise same.
+        order = sorted(
+            range(len(parcels)-1, -1, -1),
+            key=lambda k: (parcels[k].index_start, -parcels[k].index_end))
+        ancestry = []
+        last_children = {}
+        for k in order:
+            parcel = parcels[k]
+            start, end = parcel.index_start, parcel.index_end
+            while ancestry and not (
+                start >= tree.starts[ancestry[-1]] and end <= tree.ends[ancestry[-1]]
+            ): ancestry.pop()
+            if tree.kinds and not ancestry: break
+            parent = ancestry[-1] if ancestry else -1
+            node = tree._add(kind_id(parcel.kind), start, end, parent)
+            if parent != -1:
+                if parent in last_children:
+                    tree.next_siblings[last_children[parent]] = node
+                else:
+                    tree.first_children[parent] = node
+                last_children[parent] = node
+            ancestry.append(node)
+        if not tree.kinds: tree._add(kind_id(""), 0, 0, -1)
+        return tree
+
+    def _add(self, kind, start, end, parent):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.parents.append(parent)
+        self.first_children.append(-1)
+        self.next_siblings.append(-1)
+        return len(self.kinds) - 1
+
+    def __len__(self): return len(self.kinds)
+
+    def root(self): return NodeView(self, 0)
+
+    def branches_by_kind(self):
+        """
+        Return the index of the children of every node by kind id, keyed by
+        (node, kind id), built on first use. Trees are not changed once built,
+        so it is kept.
+
+        """
+        if self._branches_by_kind is None:
+            index = {}
+            kinds, parents = self.kinds, self.parents
+            for node in range(1, len(kinds)):
+                index.setdefault((parents[node], kinds[node]), []).append(node)
+            self._branches_by_kind = index
+        return self._branches_by_kind
+
+    def memory_usage(self):
+        """
+        Return the number of bytes held by the arrays, the depvar and the
+        index of `branches_by_kind` excluded.
+
+        """
+        return sum(a.itemsize*len(a) for a in (
+            self.kinds, self.starts, self.ends,
+            self.parents, self.first_children, self.next_siblings))
+
+class NodeView:
+    """
+    A node of a `CompactTree` with the interface of `Tree`, and of `Parcel`
+    as its own `data`. Views are created on access and hold no data.
+
+    """
+    __slots__ = ("tree", "node")
+
+    def __init__(self, tree, node):
+        self.tree = tree
+        self.node = node
+
+    @property
+    def data(self): return self
+
+    @property
+    def kind(self): return KINDS[self.tree.kinds[self.node]]
+
+    @property
+    def index_start(self): return self.tree.starts[self.node]
+
+    @property
+    def index_end(self): return self.tree.ends[self.node]
+
+    @property
+    def value(self):
+        tree = self.tree
+        return tree.depvar[tree.starts[self.node]:tree.ends[self.node]]
+
+    @property
+    def branches(self):
+        tree = self.tree
+        branches = []
+        child = tree.first_children[self.node]
+        while child != -1:
+            branches.append(NodeView(tree, child))
+            child = tree.next_siblings[child]
+        return branches
+
+    def get_branches(self, kind):
+        tree = self.tree
+        kind = _KIND_IDS.get(kind)
+        return [
+            NodeView(tree, node)
+            for node in tree.branches_by_kind().get((self.node, kind), ())]
+
+    @property
+    def root(self):
+        parent = self.tree.parents[self.node]
+        return None if parent == -1 else NodeView(self.tree, parent)
+
+    def to_tree(self):
+        """
+        Return the subtree as `Tree` and `Parcel` objects.
+
+        """
+        tree = Tree(Parcel(
+            self.index_start, self.index_end, None, self.kind, self.tree.depvar))
+        for b in self.branches: tree.add_branch(b.to_tree())
+        return tree
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, NodeView)
+            and self.tree is other.tree and self.node == other.node)
+
+    def __hash__(self): return hash((id(self.tree), self.node))
+
+    def __repr__(self, num_indents=0):
+        output = f"{' '*4*num_indents}{Parcel.__repr__(self)}\n"
+        for b in self.branches:
+            output += b.__repr__(num_indents=num_indents+1)
+        return output
+
+    traverse_branches = Tree.traverse_branches
@@ -1,17 +1,85 @@
 import functools
 from .tree import Tree
 from .parcel import Parcel
+from .compact_tree import CompactTree
+from .lexer import Lexer, LEXED_KINDS, LOWER, UPPER, DIGITS, WHITESPACE
 
 class EbuildDepvarParser:
-    def __init__(self, depvar):
+    def __init__(self, depvar, packrat=False, lexer=False, stats=None,
+        builder=False, kinds=None):
         self.depvar = depvar
+        # Only parcels of these kinds (and Root) are recorded, the others are
+        # matched without one. See `add_parcel`.
+        self.kinds = None if kinds is None else frozenset(kinds) | {"Root"}
+        # Keeping no character-level kind, lexing them gives the same parcels.
+        # Lexer mode cannot keep them.
+        if self.kinds is not None:
+            lexed = self.kinds & LEXED_KINDS
+            if not lexed: lexer = True
+            elif lexer: raise Exception(
+                f"Lexer mode records no {', '.join(sorted(lexed))} parcels.")
+        # Character-level rules are matched as runs without parcels. See `lex`.
+        self.lexer = Lexer(depvar) if lexer else None
         self.parcels = []
         self.i = 0
-
-    def reset(self, i=None):
+        # (rule, index) -> (end index, parcels produced). See `call`.
+        self._memo = {} if packrat else None
+        # (index, number of parcels) checkpoint for every active read.
+        self._marks = []
+        # (parcel number, Tree) of the trees built and not yet adopted by an
+        # enclosing read, in builder mode. See `add_parcel`.
+        self._pending = [] if builder else None
+        # Per-rule counters, see `parser_stats.ParserStats`.
+        if stats is not None: stats.attach(self)
+
+    def reset(self, i=None, mark=None):
         if i is None: i = self.i
-        # else: self.i = i
-        self.parcels = [p for p in self.parcels if p.index_start<i]
+        if mark is None: mark = self.mark(i)
+        self.truncate(mark)
+
+    def truncate(self, mark):
+        """
+        Drop the parcels from number `mark` on, and their trees in builder
+        mode. A tree adopting another is always built after it, so dropping
+        a tree drops the trees it adopted.
+
+        """
+        del self.parcels[mark:]
+        pending = self._pending
+        if pending is None: return
+        while pending and pending[-1][0] >= mark: pending.pop()
+
+    def add_parcel(self, index_start, index_end, name, pending_mark=None):
+        """
+        Record a parcel. In builder mode its tree is built right away and
+        adopts the pending trees from `pending_mark` on, the ones built by the
+        reads it made. Parcels of kinds not in `kinds` are not recorded, their
+        trees' branches are adopted by the enclosing recorded read instead,
+        as if pruned from the tree.
+
+        """
+        if self.kinds is not None and name not in self.kinds: return
+        parcel = Parcel(index_start, index_end, None, name, self.depvar)
+        self.parcels.append(parcel)
+        pending = self._pending
+        if pending is None: return
+        tree = Tree(parcel)
+        if pending_mark is not None and pending_mark < len(pending):
+            for _, branch in pending[pending_mark:]: tree.add_branch(branch)
+            del pending[pending_mark:]
+        pending.append((len(self.parcels)-1, tree))
+
+    def mark(self, i):
+        """
+        Return the number of parcels starting before index `i`. Parcels are
+        kept as a trail, the ones starting at or after the index of any active
+        read are always its tail, so backtracking is a truncation.
+
+        """
+        if self._marks and self._marks[-1][0] == i: return self._marks[-1][1]
+        mark = len(self.parcels)
+        while mark and self.parcels[mark-1].index_start >= i: mark -= 1
+        return mark
 
     def require(self, 
         options=[], 
@@ -22,6 +90,7 @@ class EbuildDepvarParser:
     ):
         if prev_index is None:
             prev_index = self.i
+        mark = len(self.parcels) if prev_index == self.i else None
 
         rets = []
         for option in options:
@@ -39,21 +108,78 @@ class EbuildDepvarParser:
 
         if not flag: 
             self.i = prev_index
-            self.reset(prev_index)
+            self.reset(prev_index, mark)
         return flag
 
     def look(self, options):
         _i = self.i
         for option in options:
-            if callable(option): option()
+            if callable(option): self.call(option)
             if self.i >= len(self.depvar):
                 if option is None:
                     self.i += 1
             elif self.depvar[self.i] == option: self.i += 1
             if self.i>_i: break
 
+    def call(self, rule):
+        """
+        Run a rule at the current index. In packrat mode the end index and the
+        parcels of the rules built with `reads` are memoized by (rule, index)
+        and replayed when the rule is retried at that index after a backtrack,
+        along with the trees it built in builder mode. The other rules are a
+        single read of characters or of other rules and cost less to rerun
+        than to replay.
+
+        """
+        memo = self._memo
+        if (
+            memo is None or getattr(rule, "__self__", None) is not self
+            or not getattr(rule.__func__, "memoized", False)
+        ): return rule()
+        key = (rule.__func__, self.i)
+        pending = self._pending
+        if key in memo:
+            self.i, parcels, trees = memo[key]
+            mark = len(self.parcels)
+            self.parcels.extend(parcels)
+            if pending is not None:
+                pending.extend((mark+k, tree) for k, tree in trees)
+            return
+        mark = len(self.parcels)
+        rule()
+        trees = []
+        if pending is not None:
+            trees = [(k-mark, tree) for k, tree in pending if k >= mark]
+        memo[key] = (self.i, self.parcels[mark:], trees)
+
+    def chars(self, options):
+        """
+        Return the characters matched by options that are only single
+        characters or character-level rules, otherwise None.
+
+        """
+        if isinstance(options, str): return options
+        chars = ""
+        for option in options:
+            if isinstance(option, str): chars += option; continue
+            option_chars = _CHAR_RULES.get(getattr(option, "__func__", None))
+            if option_chars is None: return None
+            chars += option_chars
+        return chars
+
+    def lex(self, chars, count=1, name=None):
+        _i = self.i
+        i = self.i = self.lexer.match(chars, _i, count)
+        if (_i < i) and not (name is None) and not (name in LEXED_KINDS):
+            self.add_parcel(_i, i, name)
+
     def read(self, options=[], exceptions=[], count=1, name=None):
+        if self.lexer is not None and not exceptions:
+            chars = self.chars(options)
+            if chars is not None: return self.lex(chars, count, name)
         i = _i = self.i
+        self._marks.append((_i, len(self.parcels)))
+        pending_mark = None if self._pending is None else len(self._pending)
 
         cur_count = 0
         while True:
@@ -61,9 +187,12 @@ class EbuildDepvarParser:
                 count!=-1 and cur_count>=count,
             )): break
             
+            mark = len(self.parcels)
             self.look(exceptions)
             if self.i > i: 
+                # Exceptions are lookaheads, drop what they parsed.
                 self.i = i
+                self.truncate(mark)
                 break
 
             self.look(options)
@@ -72,9 +201,9 @@ class EbuildDepvarParser:
             i = self.i
             cur_count += 1
 
+        self._marks.pop()
         if (_i < i) and not (name is None):
-            parcel = Parcel(_i, i, self.depvar[_i:i], name)
-            self.parcels.append(parcel)
+            self.add_parcel(_i, i, name, pending_mark)
 
 
     def reads(name):
@@ -82,14 +211,15 @@ class EbuildDepvarParser:
             @functools.wraps(func)
             def wrapper(self, *args, **kwargs):
                 self.read(*args, options=[lambda: func(self)], name=name, **kwargs)
+            wrapper.memoized = True
             return wrapper
         return decorator
 
 
-    def lalpha(self): self.read("abcdefghijklmnopqrstuvwxyz", name="AlphaLower")
-    def ualpha(self): self.read("ABCDEFGHIJKLMNOPQRSTUVWXYZ", name="AlphaUpper")
-    def digit(self): self.read("1234567890", name="Digit")
-    def whitespace(self): self.read("\n\t ", name="Whitespace")
+    def lalpha(self): self.read(LOWER, name="AlphaLower")
+    def ualpha(self): self.read(UPPER, name="AlphaUpper")
+    def digit(self): self.read(DIGITS, name="Digit")
+    def whitespace(self): self.read(WHITESPACE, name="Whitespace")
     def alpha(self): self.read([self.lalpha, self.ualpha], name="Alpha")
     def alphadig(self): self.read([self.alpha, self.digit], name="AlphaDigit")
 
@@ -348,6 +478,10 @@ class EbuildDepvarParser:
     ], count=-1, name="Root")
 
     def to_tree(self):
+        if self._pending is not None:
+            # Builder mode, the tree is already built.
+            if not self._pending: return Tree(Parcel(0,0,"",""))
+            return self._pending[0][1]
         in_tree = lambda a,o: (
             a.data.index_start >= o.data.index_start and a.data.index_end <= o.data.index_end)
         trees = [Tree(parcel) for parcel in self.parcels]
@@ -366,3 +500,20 @@ class EbuildDepvarParser:
         if not roots:
             return Tree(Parcel(0,0,"",""))
         return roots[0]
+
+    def to_compact_tree(self):
+        """
+        Return the tree of `to_tree` as a `CompactTree`, see `compact_tree`.
+
+        """
+        return CompactTree.from_parcels(self.depvar, self.parcels)
+
+
+_CHAR_RULES = {
+    EbuildDepvarParser.lalpha: LOWER,
+    EbuildDepvarParser.ualpha: UPPER,
+    EbuildDepvarParser.digit: DIGITS,
+    EbuildDepvarParser.whitespace: WHITESPACE,
+    EbuildDepvarParser.alpha: LOWER + UPPER,
+    EbuildDepvarParser.alphadig: LOWER + UPPER + DIGITS,
+}
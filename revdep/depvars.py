@@ -1,4 +1,11 @@
+import asyncio
+import json
+import queue
 import subprocess
+import sys
+import weakref
+from pathlib import Path
+from .catpkg import get_catpkg
 
 depvar_names="DEPEND RDEPEND BDEPEND IDEPEND PDEPEND"
 
@@ -7,4 +14,196 @@ def get_depvars(pkgname):
     process = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True, text=True)
     stdout, stderr = process.communicate()
     depvars = stdout.split("\n")
-    return depvars 
+    return depvars
+
+# Semaphore of the `get_depvars_async` calls not given one, by event loop.
+_default_semaphores = weakref.WeakKeyDictionary()
+
+async def get_depvars_async(pkgname, semaphore=None):
+    """
+    Counterpart of `get_depvars` for asyncio, portageq runs without blocking
+    the event loop. At most as many portageq processes as `semaphore` allows
+    run at the same time, one for all the calls without a semaphore.
+
+    """
+    if semaphore is None:
+        loop = asyncio.get_running_loop()
+        semaphore = _default_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = _default_semaphores[loop] = asyncio.BoundedSemaphore(1)
+    command = ["portageq", "metadata", "/", "ebuild", pkgname, *depvar_names.split(" ")]
+    async with semaphore:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE)
+        stdout, stderr = await process.communicate()
+    return stdout.decode().split("\n")
+
+# Answers every package name read from stdin with a JSON list of its depvars,
+# split like `get_depvars` splits the portageq output. Reads the metadata
+# through the portage API when it is importable, otherwise falls back to
+# running portageq for each package. An unknown package is answered with
+# `[""]`, any other failure with {"error": ...} so the worker keeps running.
+_WORKER = r"""
+import json, subprocess, sys
+keys = sys.argv[1].split(" ")
+try:
+    if sys.argv[2] != "api": raise ImportError
+    import portage
+    dbapi = portage.db[portage.root]["porttree"].dbapi
+    def fetch(pkgname):
+        try: return dbapi.aux_get(pkgname, keys) + [""]
+        except KeyError: return [""]
+except ImportError:
+    def fetch(pkgname):
+        command = ["portageq", "metadata", "/", "ebuild", pkgname, *keys]
+        process = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+        return process.stdout.split("\n")
+for line in sys.stdin:
+    try: reply = fetch(line.rstrip("\n"))
+    except Exception as error: reply = {"error": f"{type(error).__name__}: {error}"}
+    print(json.dumps(reply), flush=True)
+"""
+
+class PortageqWorker:
+    """
+    Persistent processes that fetch depvars for package names sent over a
+    pipe, so the interpreter start and the portage import are paid once
+    instead of once per package. With `portage_api=False` the workers run
+    portageq for every package instead of using the portage API. Thread-safe,
+    up to `processes` packages are fetched at the same time. A worker that
+    exits is replaced by a new one, the fetch it was doing raises, and so
+    does a fetch that failed in the worker.
+
+    """
+    def __init__(self, portage_api=True, processes=1):
+        self._mode = "api" if portage_api else "portageq"
+        self._processes = [self._start() for _ in range(processes)]
+        self._idle = queue.Queue()
+        for process in self._processes: self._idle.put(process)
+
+    def _start(self):
+        return subprocess.Popen(
+            [sys.executable, "-c", _WORKER, depvar_names, self._mode],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+    def _restart(self, process):
+        process.kill()
+        process.wait()
+        replacement = self._start()
+        self._processes[self._processes.index(process)] = replacement
+        return replacement
+
+    def get_depvars(self, pkgname):
+        process = self._idle.get()
+        line = ""
+        try:
+            process.stdin.write(f"{pkgname}\n")
+            process.stdin.flush()
+            line = process.stdout.readline()
+        except BrokenPipeError:
+            pass
+        finally:
+            # No answer, the process exited or was interrupted mid-fetch.
+            self._idle.put(process if line else self._restart(process))
+        if not line:
+            raise Exception(f"The portage worker exited while fetching {pkgname}.")
+        reply = json.loads(line)
+        if isinstance(reply, dict):
+            raise Exception(f"Fetching {pkgname} failed: {reply['error']}")
+        return reply
+
+    def metadata_key(self, pkgname):
+        """
+        Return the `metadata_key` of a package below `/`.
+
+        """
+        return metadata_key(pkgname)
+
+    def close(self):
+        for process in self._processes:
+            try: process.stdin.close()
+            except BrokenPipeError: pass
+            process.wait()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
+
+def get_depvars_batch(pkgnames, portage_api=True):
+    """
+    Return the depvars of every package name, by package name, fetched by a
+    single `PortageqWorker`.
+
+    """
+    with PortageqWorker(portage_api=portage_api) as worker:
+        return {pkgname: worker.get_depvars(pkgname) for pkgname in pkgnames}
+
+class MetadataReader:
+    """
+    Reads depvars straight from the on-disk metadata below `root` instead of
+    asking portage: the VDB (`var/db/pkg/<cat>/<pf>/<DEPVAR>`) for installed
+    packages, then the md5-cache (`metadata/md5-cache/<cat>/<pf>`) of the
+    ebuild repositories in `repos`, all of `var/db/repos` by default. Has the
+    interface of `PortageqWorker`.
+
+    """
+    def __init__(self, root="/", repos=None):
+        self.root = Path(root)
+        if repos is None: repos = _default_repos(self.root)
+        self.repos = [Path(repo) for repo in repos]
+
+    def get_depvars(self, pkgname):
+        names = depvar_names.split(" ")
+        vdb_path = self.root.joinpath("var", "db", "pkg", pkgname)
+        if vdb_path.is_dir():
+            return [_read_vdb(vdb_path / name) for name in names] + [""]
+        for repo in self.repos:
+            cache_path = repo.joinpath("metadata", "md5-cache", pkgname)
+            if not cache_path.is_file(): continue
+            lines = cache_path.read_text().splitlines()
+            metadata = dict(line.split("=", 1) for line in lines if "=" in line)
+            return [metadata.get(name, "") for name in names] + [""]
+        return [""]
+
+    def metadata_key(self, pkgname):
+        return metadata_key(pkgname, self.root, self.repos)
+
+    def close(self): pass
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc_info): self.close()
+
+def metadata_key(pkgname, root="/", repos=None):
+    """
+    Return a key of the on-disk metadata of a package CPV that changes when
+    its depvars may have changed: the VDB `COUNTER` of the installed package,
+    and the modification time and size of its ebuild and md5-cache entry in
+    each repository of `repos`, all of `var/db/repos` below `root` by default.
+    Files are only stat'ed and read, no subprocess is run. None if the
+    package is found nowhere.
+
+    """
+    root = Path(root)
+    if repos is None: repos = _default_repos(root)
+    parts = []
+    vdb_path = root.joinpath("var", "db", "pkg", pkgname)
+    if vdb_path.is_dir(): parts.append(f"vdb:{_read_vdb(vdb_path / 'COUNTER')}")
+    pf = pkgname.rsplit("/", 1)[-1]
+    try: catpkg = get_catpkg(pkgname)
+    except Exception: catpkg = None
+    for repo in repos:
+        paths = [Path(repo).joinpath("metadata", "md5-cache", pkgname)]
+        if catpkg is not None: paths.append(Path(repo).joinpath(catpkg, f"{pf}.ebuild"))
+        for path in paths:
+            try: stat = path.stat()
+            except OSError: continue
+            parts.append(f"{path}:{stat.st_mtime_ns}:{stat.st_size}")
+    return " ".join(parts) or None
+
+def _default_repos(root):
+    return sorted(root.joinpath("var", "db", "repos").glob("*"))
+
+def _read_vdb(path):
+    try: return path.read_text().rstrip("\n")
+    except FileNotFoundError: return ""
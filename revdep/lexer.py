@@ -0,0 +1,39 @@
+import functools
+import re
+
+# Character-level kinds the lexer consumes without recording parcels.
+LEXED_KINDS = frozenset((
+    "AlphaLower", "AlphaUpper", "Alpha", "Digit", "AlphaDigit", "Whitespace",
+))
+
+LOWER = "abcdefghijklmnopqrstuvwxyz"
+UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+DIGITS = "1234567890"
+WHITESPACE = "\n\t "
+
+class Lexer:
+    """
+    Tokenizes a depvar into runs of a character class. The token boundaries of
+    the depvar grammar depend on the rule asking (a package name stops where a
+    version starts, a slot name may contain dots, ...), so tokens are matched
+    on demand with a compiled regular expression per character class and
+    count instead of being split up front.
+
+    """
+    def __init__(self, depvar):
+        self.depvar = depvar
+
+    def match(self, chars, i, count=1):
+        """
+        Return the end index of the longest run of at most `count` (-1 for no
+        limit) characters from `chars` starting at index `i`.
+
+        """
+        # The end-of-input rule steps past the end, re would clamp it back.
+        if i >= len(self.depvar): return i
+        return _pattern(chars, count).match(self.depvar, i).end()
+
+@functools.lru_cache(maxsize=None)
+def _pattern(chars, count):
+    quantifier = "*" if count == -1 else f"{{0,{count}}}"
+    return re.compile(f"[{re.escape(chars)}]{quantifier}")
@@ -1,12 +1,27 @@
 class Parcel:
-    def __init__(self, index_start, index_end, value, kind):
+    """
+    A match of a grammar rule: its kind and the text between `index_start`
+    and `index_end`. Given `source` instead of `value`, the text is sliced
+    from the source the first time `value` is read.
+
+    """
+    __slots__ = ("index_start", "index_end", "kind", "_value", "_source")
+
+    def __init__(self, index_start, index_end, value, kind, source=None):
         self.index_start = index_start
         self.index_end = index_end
-        self.value = value
+        self._value = value
+        self._source = source
         self.kind = kind
 
+    @property
+    def value(self):
+        if self._value is None:
+            self._value = self._source[self.index_start:self.index_end]
+            self._source = None
+        return self._value
+
     def __repr__(self): return (
         f"{self.kind}: {self.value} "
         f"({self.index_start},{self.index_end})")
 
-
@@ -0,0 +1,90 @@
+import time
+
+class RuleStats:
+    """
+    Counters of one named grammar rule. `time` includes the rules it calls.
+
+    """
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.backtracks = 0
+        self.chars = 0
+        self.time = 0.0
+
+    def __repr__(self):
+        return (
+            f"RuleStats({self.name!r}, calls={self.calls}, "
+            f"successes={self.successes}, failures={self.failures}, "
+            f"backtracks={self.backtracks}, chars={self.chars}, "
+            f"time={self.time:.6f})")
+
+class ParserStats:
+    """
+    Per-rule profile of `EbuildDepvarParser`, collected over every parser it
+    is passed to as `stats`. `rules` maps the name of each named read (the
+    kind of its parcels) to its `RuleStats`: calls, the calls that consumed
+    characters or not, the failed `require`s inside it that made it
+    backtrack, the characters it consumed and its cumulative time.
+
+    Parsers without stats are not instrumented at all, `attach` replaces the
+    `read` and `reset` methods of a parser with counting ones. Character
+    runs matched in lexer mode still count as calls of their rule. Rules
+    replayed from the packrat memo are not called and not counted.
+
+    """
+    def __init__(self):
+        self.rules = {}
+
+    def attach(self, parser):
+        rules = self.rules
+        read = parser.read
+        reset = parser.reset
+        active = []
+
+        def profiled_read(options=[], exceptions=[], count=1, name=None):
+            if name is None: return read(options, exceptions, count, name)
+            rule = rules.get(name)
+            if rule is None: rule = rules[name] = RuleStats(name)
+            _i = parser.i
+            active.append(rule)
+            start = time.perf_counter()
+            try:
+                read(options, exceptions, count, name)
+            finally:
+                rule.time += time.perf_counter() - start
+                active.pop()
+            rule.calls += 1
+            if parser.i > _i:
+                rule.successes += 1
+                rule.chars += parser.i - _i
+            else:
+                rule.failures += 1
+
+        def profiled_reset(i=None, mark=None):
+            if active: active[-1].backtracks += 1
+            reset(i, mark)
+
+        parser.read = profiled_read
+        parser.reset = profiled_reset
+
+    def format_table(self, sort_by="time"):
+        """
+        Return the rules as a table, sorted by one of the `RuleStats`
+        counters, largest first.
+
+        """
+        rules = sorted(
+            self.rules.values(), key=lambda r: getattr(r, sort_by), reverse=True)
+        lines = [
+            f"{'rule':<26} {'calls':>8} {'success':>8} {'fail':>8} "
+            f"{'backtrack':>9} {'chars':>8} {'time ms':>9}"]
+        for r in rules:
+            lines.append(
+                f"{r.name:<26} {r.calls:>8} {r.successes:>8} {r.failures:>8} "
+                f"{r.backtracks:>9} {r.chars:>8} {r.time*1e3:>9.3f}")
+        return "\n".join(lines)
+
+    def __str__(self): return self.format_table()
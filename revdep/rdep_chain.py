@@ -1,3 +1,20 @@
+import hashlib
+import subprocess
+from .compact_graph import CompactRdepGraph
+from . import snapshot
+from .traversal import walk_rdep_chain
+
+EMERGE_COMMAND = ["emerge", "--pretend", "--verbose", "--emptytree", "--depclean"]
+
+def run_emerge(command=EMERGE_COMMAND):
+    """
+    Run `emerge --pretend --verbose --emptytree --depclean` and yield its
+    output lines as they are printed.
+
+    """
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as process:
+        yield from process.stdout
+
 class SystemReverseDependencyChain:
     """
     Parses the output from `emerge --pretend --verbose --emptytree --depclean`
@@ -5,12 +22,26 @@ class SystemReverseDependencyChain:
     `get_pkg_rdep_chain` method to fetch a hierarchy of reverse dependencies
     for a package. 
 
+    The output is either a string or any iterable of lines, like a file or
+    `run_emerge()`. With `stream=True` nothing is read until `ingest` is
+    iterated, which fills `dependees_by_dependency` section by section.
+
+    Graphs can be saved as a binary snapshot and memory-mapped back with
+    `load_snapshot`, which skips parsing. `checksum` is the sha256 digest of
+    the part of the output read so far, so a snapshot of an older output is
+    detected as stale.
+
     """
-    def __init__(self, emerge_deps_output):
-        lines = emerge_deps_output.split("\n")
+    def __init__(self, emerge_deps_output, stream=False):
+        if isinstance(emerge_deps_output, str):
+            emerge_deps_output = emerge_deps_output.split("\n")
 
-        self._lines = self._filter_input_lines(lines)
-        self.dependees_by_dependency = self._find_dependees()
+        self._sha256 = hashlib.sha256()
+        self._lines = self._filter_input_lines(emerge_deps_output)
+        self.dependees_by_dependency = {}
+        self.section_hashes = {}
+        if not stream:
+            for _ in self.ingest(): pass
 
     def _filter_input_lines(self, input_lines):
         start_token = "pulled in by:"
@@ -18,46 +49,164 @@ class SystemReverseDependencyChain:
         start_flag = False
         end_flag = False
         for line in input_lines:
+            line = line.rstrip("\n")
             if not start_flag: start_flag = line.endswith(start_token)
             if start_flag: end_flag = line.startswith(end_token)
             if end_flag: break
+            self._sha256.update(line.encode() + b"\n")
             yield(line)
 
-    def _find_dependees(self):
-        is_blank = lambda line: not line.strip()
+    def _iter_sections(self):
+        """
+        Yield (pkgname, lines) for every section of the output, its header
+        line and the dependee lines indented below it, leaving them unsplit.
 
-        dependees_by_dependency = {}
+        """
         dependee_indent = 0
-        dependee_pkgname = ""
+        lines = []
         for line in self._lines:
-            if is_blank(line): continue
+            if not line or line.isspace(): continue
+            if dependee_indent and line[:dependee_indent+1].isspace():
+                lines.append(line)
+                continue
+            if len(lines) > 1: yield((lines[0].strip().split(" ")[0], lines))
+            dependee_indent = len(line) - len(line.lstrip())
+            lines = [line]
+        if len(lines) > 1: yield((lines[0].strip().split(" ")[0], lines))
 
-            line_indent = len(line) - len(line.lstrip())
-            line_pkgname = line.strip().split(" ")[0]
+    def ingest(self):
+        """
+        Read the remaining output, yielding each package once its section has
+        been added to `dependees_by_dependency`.
 
-            if not dependee_indent or line_indent <= dependee_indent:
-                dependee_indent = line_indent
-                dependee_pkgname = line_pkgname
-            else: 
-                dependees_by_dependency.setdefault(dependee_pkgname, [])
-                dependees_by_dependency[dependee_pkgname].append(line_pkgname)
-        return(dependees_by_dependency)
+        """
+        for pkgname, _ in self._ingest(): yield(pkgname)
 
-    def get_pkg_rdep_chain(self, pkgname=None, _seen=None, _level=0):
-        atom_group_prefix = "@"
+    def _ingest(self, previous={}, previous_hashes={}):
+        """
+        Like `ingest`, yielding (pkgname, reused). The blake2b digest of the
+        lines of each section is kept in `section_hashes`. A section with the
+        same digest as in `previous_hashes` is not split, the dependee list of
+        `previous` is reused as is.
 
-        if _seen is None: _seen = []
-        if pkgname is None: pkgname = self.prompt_pkgname()
-        yield((_level,pkgname,))
+        """
+        dependees_by_dependency = self.dependees_by_dependency
+        hashes = self.section_hashes
+        for pkgname, lines in self._iter_sections():
+            section_hash = hashlib.blake2b(
+                "\n".join(lines).encode(), digest_size=16).digest()
+            if pkgname in dependees_by_dependency:
+                # Several sections of a package, never reused.
+                hashes[pkgname] = None
+                dependees = dependees_by_dependency[pkgname] = list(
+                    dependees_by_dependency[pkgname])
+                dependees.extend(line.strip().split(" ")[0] for line in lines[1:])
+                yield(pkgname, False)
+                continue
+            hashes[pkgname] = section_hash
+            if previous_hashes.get(pkgname) == section_hash:
+                dependees_by_dependency[pkgname] = previous[pkgname]
+                yield(pkgname, True)
+                continue
+            dependees_by_dependency[pkgname] = [
+                line.strip().split(" ")[0] for line in lines[1:]]
+            yield(pkgname, False)
+
+    @classmethod
+    def from_previous(cls, previous, emerge_deps_output):
+        """
+        Build the graph of a newer emerge output against a previous one, a
+        `SystemReverseDependencyChain`, its `dependees_by_dependency` or a
+        snapshot. Return the new chain and {pkgname: (added, removed)} for the
+        packages whose dependees changed, a package missing from one of the
+        graphs having all its dependees added or removed. The result equals a
+        full rebuild.
 
-        for dependency_name in self.dependees_by_dependency.get(pkgname,[]):
-            if dependency_name in _seen:
+        Against a `SystemReverseDependencyChain`, the sections of the output
+        whose lines have the same digest as in the previous output (see
+        `section_hashes`) are neither split nor diffed, their
+        dependee lists are reused. The output is still read and hashed in
+        full. A dictionary or a snapshot has no section hashes, every package
+        is then split and diffed.
+
+        """
+        hashes = getattr(previous, "section_hashes", {})
+        previous = getattr(previous, "dependees_by_dependency", previous)
+        rdep_chain = cls(emerge_deps_output, stream=True)
+        current = rdep_chain.dependees_by_dependency
+
+        changed = list(dict.fromkeys(
+            pkgname for pkgname, reused in rdep_chain._ingest(previous, hashes)
+            if not reused))
+        changes = {}
+        for pkgname in changed:
+            dependees = current[pkgname]
+            previous_dependees = previous.get(pkgname, [])
+            if dependees == previous_dependees:
+                if isinstance(previous_dependees, list):
+                    current[pkgname] = previous_dependees
                 continue
-            if not dependency_name.startswith(atom_group_prefix):
-                _seen.append(dependency_name)
-            yield from self.get_pkg_rdep_chain(
-                pkgname=dependency_name, 
-                _seen=_seen, 
-                _level=_level+1)
+            added = set(dependees).difference(previous_dependees)
+            removed = set(previous_dependees).difference(dependees)
+            if added or removed:
+                changes[pkgname] = (
+                    [d for d in dependees if d in added],
+                    [d for d in previous_dependees if d in removed])
+        # No package of `previous` is gone unless fewer are left than it had.
+        new = sum(1 for pkgname in changed if pkgname not in previous)
+        if len(current) - new < len(previous):
+            for pkgname in previous:
+                if pkgname not in current:
+                    changes[pkgname] = ([], list(previous[pkgname]))
+        return rdep_chain, changes
+
+    def compact(self):
+        """
+        Return the graph as a `CompactRdepGraph`.
+
+        """
+        return CompactRdepGraph.from_dependees(
+            self.dependees_by_dependency, self.checksum)
+
+    @property
+    def checksum(self): return self._sha256.digest()
+
+    def save_snapshot(self, path):
+        """
+        Write the graph to `path` as a binary snapshot, see `snapshot`.
+
+        """
+        snapshot.save_snapshot(self.compact(), path, self.checksum)
+
+    @staticmethod
+    def load_snapshot(path, emerge_deps_output=None):
+        """
+        Return the `CompactRdepGraph` saved in a snapshot, memory-mapped. If
+        `emerge_deps_output` is given, raise `snapshot.StaleSnapshotError`
+        unless the snapshot was saved from that output.
+
+        """
+        checksum = None
+        if emerge_deps_output is not None:
+            source = SystemReverseDependencyChain(emerge_deps_output, stream=True)
+            for _ in source._lines: pass
+            checksum = source.checksum
+        return snapshot.load_snapshot(path, checksum)
+
+    def get_pkg_rdep_chain(self, pkgname=None, order="dfs", max_depth=None):
+        """
+        Yield (level, pkgname) for a package and its reverse dependencies, see
+        `traversal.walk_rdep_chain` for `order` and `max_depth`.
+
+        """
+        atom_group_prefix = "@"
+
+        if pkgname is None: pkgname = self.prompt_pkgname()
+        yield from walk_rdep_chain(
+            pkgname,
+            lambda pkgname: self.dependees_by_dependency.get(pkgname,[]),
+            lambda pkgname: pkgname.startswith(atom_group_prefix),
+            order=order,
+            max_depth=max_depth)
 
 
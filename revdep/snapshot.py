@@ -0,0 +1,86 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from .compact_graph import CompactRdepGraph
+
+MAGIC = b"RDEPSNAP"
+# Bump when the layout changes, older snapshots are refused.
+FORMAT_VERSION = 1
+# Magic, byte order, format version, sha256 of the emerge output, number of
+# names, number of targets and length of the string table.
+HEADER = struct.Struct("<8sB3xI32sIII")
+
+class StaleSnapshotError(Exception):
+    """
+    The snapshot was saved from a different emerge output.
+
+    """
+
+def save_snapshot(graph, path, checksum):
+    """
+    Write a `CompactRdepGraph` to `path`: a header, the package names as a
+    newline separated UTF-8 string table, then the `offsets` and `targets`
+    arrays in native byte order, each aligned to 4 bytes. `checksum` is the
+    sha256 digest of the emerge output the graph was built from. The file
+    is replaced whole, processes that mapped the previous one keep it.
+
+    """
+    strings = "\n".join(graph.names).encode()
+    strings += b"\0"*(-len(strings) % 4)
+    offsets = array("I", graph.offsets)
+    targets = array("I", graph.targets)
+    # Written aside and renamed over `path`, truncating a snapshot other
+    # processes have mapped would crash them with SIGBUS.
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), prefix=".snapshot-")
+    try:
+        with open(fd, "wb") as f:
+            f.write(HEADER.pack(
+                MAGIC, sys.byteorder == "big", FORMAT_VERSION, checksum,
+                len(graph.names), len(targets), len(strings)))
+            f.write(strings)
+            f.write(offsets.tobytes())
+            f.write(targets.tobytes())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def load_snapshot(path, checksum=None):
+    """
+    Memory-map a snapshot written by `save_snapshot` and return it as a
+    `CompactRdepGraph` whose `offsets` and `targets` are views of the mapped
+    file, shared by every process loading it. Only the names are decoded.
+    Raises `StaleSnapshotError` if `checksum` is given and differs from the
+    one saved.
+
+    """
+    with open(path, "rb") as f:
+        # An empty file cannot be mapped.
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise Exception(f"{path} is not a revdep snapshot.")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise Exception(f"{path} is not a revdep snapshot.")
+    (_, big_endian, version, saved_checksum,
+        name_count, target_count, strings_size) = HEADER.unpack_from(buffer)
+    if version != FORMAT_VERSION:
+        raise Exception(f"Unsupported snapshot version {version} in {path}.")
+    if big_endian != (sys.byteorder == "big"):
+        raise Exception(f"{path} was saved with a different byte order.")
+    if checksum is not None and checksum != saved_checksum:
+        raise StaleSnapshotError(f"{path} does not match the emerge output.")
+
+    view = memoryview(buffer)
+    start = HEADER.size
+    strings = bytes(view[start:start+strings_size]).rstrip(b"\0")
+    names = [sys.intern(name) for name in strings.decode().split("\n")]
+    if not strings: names = []
+    start += strings_size
+    offsets = view[start:start+4*(name_count+1)].cast("I")
+    start += 4*(name_count+1)
+    targets = view[start:start+4*target_count].cast("I")
+    return CompactRdepGraph(names, offsets, targets, checksum=saved_checksum)
@@ -0,0 +1,86 @@
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .atom_causal_chain import AtomCausalChain
+from .compact_graph import CompactRdepGraph
+from .snapshot import load_snapshot, save_snapshot
+from . import depvars
+
+# The graph, depvar worker and catpkg index memo of a pool process,
+# set by `_init_process`. The graph is set before forking the pool instead
+# when `sweep` can, so it is inherited rather than pickled.
+_state = {}
+
+def _init_process(snapshot_path, root):
+    if snapshot_path is not None: _state["graph"] = load_snapshot(snapshot_path)
+    if root is not None: worker = depvars.MetadataReader(root=root)
+    else: worker = depvars.PortageqWorker()
+    multiprocessing.util.Finalize(worker, worker.close, exitpriority=10)
+    _state["worker"] = worker
+    _state["memo"] = {}
+
+def _get_causal_chain(pkgname):
+    try:
+        causal_chain = AtomCausalChain(
+            rdep_chain=_state["graph"], pkgname=pkgname,
+            worker=_state["worker"], memo=_state["memo"])
+        links = [link.to_dict() for link in causal_chain.causal_chain]
+    except Exception as e:
+        return {"pkgname": pkgname, "error": f"{type(e).__name__}: {e}"}
+    return {"pkgname": pkgname, "links": links}
+
+def sweep(graph, pkgnames=None, jobs=None, root=None):
+    """
+    Yield the causal chain of every package of `graph` (or of `pkgnames`) as
+    {"pkgname": ..., "links": [...]} in the order they complete, computed by
+    `jobs` processes (one per CPU by default). A chain failing gives
+    {"pkgname": ..., "error": ...} instead.
+
+    Each process has its own depvar worker (`MetadataReader` below `root` if
+    given) and keeps the catpkg indexes it loaded for its next chains. The
+    `DepvarCache` is not used, its writes would serialize the processes on
+    the sqlite lock. `graph` is either a `SystemReverseDependencyChain`, a
+    `CompactRdepGraph` or the path of a snapshot. Processes are forked with
+    the graph in memory when the platform can fork, otherwise they
+    memory-map a snapshot of it.
+
+    """
+    if isinstance(graph, (str, os.PathLike)):
+        snapshot_path = graph
+        graph = load_snapshot(snapshot_path)
+    else:
+        snapshot_path = None
+    if pkgnames is None: pkgnames = list(graph.dependees_by_dependency)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        context = None
+        if snapshot_path is None and "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            _state["graph"] = graph
+        elif snapshot_path is None:
+            snapshot_path = os.path.join(temp_dir, "rdeps.snapshot")
+            if not isinstance(graph, CompactRdepGraph): graph = graph.compact()
+            save_snapshot(graph, snapshot_path, graph.checksum or b"")
+        try:
+            with ProcessPoolExecutor(
+                max_workers=jobs, mp_context=context, initializer=_init_process,
+                initargs=(snapshot_path, root),
+            ) as executor:
+                futures = [
+                    executor.submit(_get_causal_chain, pkgname)
+                    for pkgname in pkgnames]
+                for future in as_completed(futures): yield future.result()
+        finally:
+            _state.pop("graph", None)
+
+def write_jsonl(results, out):
+    """
+    Write each result as a line of JSON as soon as it arrives.
+
+    """
+    for result in results:
+        out.write(json.dumps(result) + "\n")
+        out.flush()
@@ -0,0 +1,37 @@
+import collections
+
+def walk_rdep_chain(pkg, get_dependees, is_group, order="dfs", max_depth=None):
+    """
+    Yield (level, pkg) for a package and its reverse dependencies with an
+    explicit stack ("dfs", the order of the recursive walk) or queue ("bfs").
+    A package is visited once, tracked in a set, except group packages (like
+    `@selected`) which are visited wherever they are reached. Packages deeper
+    than `max_depth` are not visited.
+
+    """
+    seen = set()
+    yield((0,pkg,))
+    if order == "dfs":
+        stack = [iter(get_dependees(pkg))]
+        while stack:
+            for dependee in stack[-1]:
+                if dependee in seen: continue
+                if not is_group(dependee): seen.add(dependee)
+                yield((len(stack),dependee,))
+                if max_depth is None or len(stack) < max_depth:
+                    stack.append(iter(get_dependees(dependee)))
+                break
+            else:
+                stack.pop()
+    elif order == "bfs":
+        queue = collections.deque([(0,pkg,)])
+        while queue:
+            level,pkg = queue.popleft()
+            if max_depth is not None and level >= max_depth: continue
+            for dependee in get_dependees(pkg):
+                if dependee in seen: continue
+                if not is_group(dependee): seen.add(dependee)
+                yield((level+1,dependee,))
+                queue.append((level+1,dependee,))
+    else:
+        raise Exception(f"Unknown traversal order {order}.")
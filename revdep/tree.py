@@ -1,3 +1,11 @@
+def kind_key(tree):
+    """
+    Key of a tree's kind. `Tree.traverse_branches` given this key looks
+    branches up in the per-kind index instead of scanning them.
+
+    """
+    return tree.data.kind
+
 class Tree:
     """
     Provides a tree structure with each tree having a list of branch trees, a
@@ -6,10 +14,13 @@ class Tree:
     provided. 
 
     """
+    __slots__ = ("data", "_root", "_branches", "_branches_by_kind")
+
     def __init__(self, data=None):
         self.data = data
         self._root = None
         self._branches = []
+        self._branches_by_kind = None
 
     @property
     def branches(self):
@@ -18,6 +29,22 @@ class Tree:
     def add_branch(self, tree):
         tree._root = self
         self._branches.append(tree)
+        if self._branches_by_kind is not None:
+            self._branches_by_kind.setdefault(tree.data.kind, []).append(tree)
+
+    def get_branches(self, kind):
+        """
+        Return the branches of a kind, in order. The index by kind is built
+        on first use and kept up to date by `add_branch`. The list returned
+        is the index's own.
+
+        """
+        if self._branches_by_kind is None:
+            branches_by_kind = {}
+            for branch in self._branches:
+                branches_by_kind.setdefault(branch.data.kind, []).append(branch)
+            self._branches_by_kind = branches_by_kind
+        return self._branches_by_kind.get(kind, [])
 
     def __repr__(self, num_indents=0):
         output = f"{' '*4*num_indents}{self.data}\n"
@@ -35,6 +62,9 @@ class Tree:
             else: raise Exception(
                 f"Multiple potential branches for {value}.")
 
+            if key is kind_key:
+                branch = list(branch.get_branches(value))
+                continue
             branch_by_value = {}
             for branch in branch.branches:
                 branch_value = key(branch)
@@ -0,0 +1,65 @@
+import functools
+
+class TreePath:
+    """
+    A path of steps from a tree to the branches it matches, each step one of
+    a kind (the branches of that kind), `*` (every branch) or `**` (the tree
+    and all its descendants). Unlike `Tree.traverse_branches` every step
+    follows all matches, so `**/Atom/CatPkg` gives the `CatPkg` of every
+    atom at any depth. The first step applies to the branches of the tree
+    matched against, not to the tree itself. Compile paths once with
+    `compile_path`.
+
+    """
+    def __init__(self, steps):
+        self.steps = tuple(steps)
+
+    def match(self, tree):
+        """
+        Return the matching branches, each once. Every step keeps the order
+        of the trees the previous step matched, so matches are grouped by the
+        tree they were reached from rather than in depvar order.
+
+        """
+        trees = [tree]
+        for step in self.steps:
+            if step == "**":
+                trees = _descendants(trees)
+            elif step == "*":
+                trees = [b for t in trees for b in t.branches]
+            else:
+                trees = [b for t in trees for b in t.get_branches(step)]
+        return trees
+
+    def __call__(self, tree): return self.match(tree)
+
+    def __repr__(self): return f"TreePath({'/'.join(self.steps)!r})"
+
+@functools.lru_cache(maxsize=None)
+def compile_path(path):
+    """
+    Return the `TreePath` of `path`, steps separated by `/` (e.g.
+    `**/DynamicUse/UseQuery`), or a tuple of steps. Compiled paths are kept,
+    the same path always gives the same object.
+
+    """
+    if isinstance(path, str): path = [step for step in path.split("/") if step]
+    steps = []
+    for step in path:
+        # Consecutive descendant steps match the same trees as one.
+        if step == "**" and steps and steps[-1] == "**": continue
+        steps.append(step)
+    return TreePath(steps)
+
+def _descendants(trees):
+    seen = set()
+    out = []
+    for tree in trees:
+        stack = [tree]
+        while stack:
+            t = stack.pop()
+            if t in seen: continue
+            seen.add(t)
+            out.append(t)
+            stack.extend(reversed(t.branches))
+    return out
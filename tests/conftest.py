@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import pytest
+
+METADATA = {
+    "app-misc/a-2.0": {
+        "DEPEND": "dev-libs/b",
+        "RDEPEND": ">=dev-libs/b-1.0 x? ( dev-libs/c )",
+    },
+    "dev-libs/c-1.0": {
+        "RDEPEND": "|| ( dev-libs/b dev-libs/d )",
+    },
+}
+
+EMERGE_OUTPUT = """
+Calculating dependencies  ... done!
+  app-misc/a-2.0 pulled in by:
+    @selected
+
+  dev-libs/b-1.0 pulled in by:
+    app-misc/a-2.0 requires >=dev-libs/b-1.0
+    dev-libs/c-1.0 requires dev-libs/b
+
+  dev-libs/c-1.0 pulled in by:
+    app-misc/a-2.0 requires dev-libs/c
+
+>>> No packages selected for removal by depclean
+"""
+
+FAKE_PORTAGEQ = """#!{python}
+import json, sys, time
+time.sleep({delay})
+_, root, pkgtype, pkgname, *keys = sys.argv[1:]
+metadata = json.load(open({metadata_path!r}))
+if pkgname not in metadata:
+    sys.exit(f"{{pkgname}} not found")
+for key in keys:
+    print(metadata[pkgname].get(key, ""))
+"""
+
+@pytest.fixture
+def fake_portageq(tmp_path, monkeypatch):
+    r"""
+    Put a `portageq` answering `metadata / ebuild` queries from METADATA on
+    PATH. Call the fixture to change its metadata or add latency.
+
+    """
+    def install(metadata=METADATA, delay=0):
+        metadata_path = tmp_path / "metadata.json"
+        metadata_path.write_text(json.dumps(metadata))
+        portageq = tmp_path / "portageq"
+        portageq.write_text(FAKE_PORTAGEQ.format(
+            python=sys.executable, delay=delay, metadata_path=str(metadata_path)))
+        portageq.chmod(0o755)
+    install()
+    monkeypatch.setenv("PATH", str(tmp_path), prepend=os.pathsep)
+    return install
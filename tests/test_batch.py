@@ -0,0 +1,71 @@
+import io
+import sys
+import pytest
+from revdep import depvars
+from revdep.__main__ import main
+from revdep.batch import match_pkgnames, read_queries, run_batch
+from revdep.rdep_chain import SystemReverseDependencyChain
+from conftest import EMERGE_OUTPUT
+
+def test_queries():
+    pkgnames = ["app-misc/a-2.0", "dev-libs/b-1.0", "dev-libs/c-1.0"]
+    assert list(read_queries(["dev-libs/b-1.0\n", "\n", "# comment\n", " ^app \n"])) == [
+        "dev-libs/b-1.0", "^app"]
+    assert match_pkgnames("dev-libs/b-1.0", pkgnames) == ["dev-libs/b-1.0"]
+    assert match_pkgnames("dev-libs", pkgnames) == ["dev-libs/b-1.0", "dev-libs/c-1.0"]
+    assert match_pkgnames("^x11", pkgnames) == []
+    with pytest.raises(Exception):
+        match_pkgnames("dev-libs/[", pkgnames)
+
+def test_run_batch(fake_portageq):
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    out, err = io.StringIO(), io.StringIO()
+    with depvars.PortageqWorker(portage_api=False) as worker:
+        calls = []
+        get_depvars = worker.get_depvars
+        worker.get_depvars = lambda pkgname: calls.append(pkgname) or get_depvars(pkgname)
+        unmatched = run_batch(
+            rdep_chain, ["dev-libs/b-1.0", "dev-libs/[", "^dev-libs/c", "^x11"],
+            worker, out=out, err=err)
+    assert unmatched == 2
+    assert sorted(calls) == ["app-misc/a-2.0", "dev-libs/c-1.0"]
+    assert out.getvalue().count("dev-libs/b-1.0 ,dev-libs/b-1.0") == 1
+    assert "- RDEPEND: ['||', 'dev-libs/b']" in out.getvalue()
+    lines = err.getvalue().splitlines()
+    assert lines[0].startswith("# dev-libs/b-1.0: 1 packages, 4 links, ")
+    assert lines[1] == "# dev-libs/[: Invalid regex dev-libs/[."
+    assert lines[3].startswith("# ^x11: 0 packages, 0 links, ")
+
+def test_main_batch(fake_portageq, tmp_path, capsys, monkeypatch):
+    emerge_output = tmp_path / "emerge_rdeps.txt"
+    emerge_output.write_text(EMERGE_OUTPUT)
+    monkeypatch.setattr("sys.stdin", io.StringIO("dev-libs/c-1.0\n"))
+    status = main([
+        "--emerge-output", str(emerge_output), "--no-cache",
+        "dev-libs/b-1.0", "-f", "-"])
+    assert status == 0
+    captured = capsys.readouterr()
+    assert "dev-libs/c-1.0 ,dev-libs/c-1.0" in captured.out
+    assert "# dev-libs/c-1.0: 1 packages" in captured.err
+
+def test_main_parser_stats(fake_portageq, tmp_path, capsys):
+    emerge_output = tmp_path / "emerge_rdeps.txt"
+    emerge_output.write_text(EMERGE_OUTPUT)
+    main([
+        "--emerge-output", str(emerge_output), "--no-cache", "--parser-stats",
+        "dev-libs/b-1.0"])
+    err = capsys.readouterr().err
+    assert err.splitlines()[1].split()[0] == "rule"
+    assert "CatPkg" in err
+
+def test_main_run_emerge(fake_portageq, tmp_path, capsys):
+    emerge = tmp_path / "emerge"
+    emerge.write_text(f"#!{sys.executable}\nprint({EMERGE_OUTPUT!r})\n")
+    emerge.chmod(0o755)
+    assert main(["--run-emerge", "--no-cache", "dev-libs/b-1.0"]) == 0
+    assert "- RDEPEND: ['||', 'dev-libs/b']" in capsys.readouterr().out
+
+@pytest.mark.parametrize("option", [["--all"], ["-j", "2"]])
+def test_main_parser_stats_rejected(option):
+    with pytest.raises(SystemExit):
+        main(["--parser-stats", *option, "dev-libs/b-1.0"])
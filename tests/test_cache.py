@@ -0,0 +1,76 @@
+from revdep.atom_causal_chain import AtomCausalChain
+from revdep.cache import DepvarCache
+from revdep.depvar_parser import EbuildDepvarParser
+from revdep.depvars import PortageqWorker, MetadataReader
+from revdep.rdep_chain import SystemReverseDependencyChain
+from conftest import EMERGE_OUTPUT, METADATA
+from test_parser_modes import dump
+
+def test_tree_roundtrip(tmp_path):
+    depvar = ">=dev-libs/glib-2.0 x11-libs/gtk+:3 X? ( x11-libs/libX11 )"
+    parser = EbuildDepvarParser(depvar)
+    parser.root()
+    tree = parser.to_tree()
+    with DepvarCache(tmp_path / "cache.sqlite") as cache:
+        cache.put_tree("app-misc/a-2.0", "RDEPEND", depvar, tree)
+    with DepvarCache(tmp_path / "cache.sqlite") as cache:
+        assert dump(cache.get_tree("app-misc/a-2.0", "RDEPEND", depvar)) == dump(tree)
+        assert cache.get_tree("app-misc/a-2.0", "RDEPEND", depvar + " a/b") is None
+        assert (cache.hits["trees"], cache.misses["trees"]) == (1, 1)
+
+def test_eviction(tmp_path):
+    with DepvarCache(tmp_path / "cache.sqlite", max_entries=2) as cache:
+        cache.put_depvars("a/a-1", ["a"])
+        cache.put_depvars("b/b-1", ["b"])
+        cache.get_depvars("a/a-1")
+        cache.put_depvars("c/c-1", ["c"])
+        assert cache.get_depvars("b/b-1") is None
+        assert cache.get_depvars("a/a-1") == ["a"]
+        assert cache.get_depvars("c/c-1") == ["c"]
+
+def write_md5_cache(root, metadata):
+    for pkgname, depvars in metadata.items():
+        path = root / "var/db/repos/gentoo/metadata/md5-cache" / pkgname
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("".join(f"{k}={v}\n" for k, v in depvars.items()))
+
+def test_causal_chain_cache(tmp_path):
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    def links(cache):
+        with MetadataReader(root=tmp_path) as reader:
+            chain = AtomCausalChain(
+                rdep_chain, "dev-libs/b-1.0", worker=reader, cache=cache)
+            return [(l.level, l.pkgname, l.items) for l in chain.causal_chain]
+    write_md5_cache(tmp_path, METADATA)
+    with DepvarCache(tmp_path / "cache.sqlite") as cache:
+        expected = links(cache)
+        assert cache.hits["trees"] == 0
+    with DepvarCache(tmp_path / "cache.sqlite") as cache:
+        assert links(cache) == expected
+        assert cache.misses["depvars"] == cache.misses["trees"] == 0
+
+    # Regenerated metadata of the same CPV.
+    write_md5_cache(tmp_path, {"dev-libs/c-1.0": {"RDEPEND": "dev-libs/d"}})
+    with DepvarCache(tmp_path / "cache.sqlite") as cache:
+        assert links(cache) == expected[:-1] + [(1, "dev-libs/c-1.0", [])]
+        assert cache.misses["depvars"] == 1
+        assert cache.hits["depvars"] == 1
+
+def test_max_age(tmp_path, fake_portageq):
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    def links(cache):
+        with PortageqWorker(portage_api=False) as worker:
+            chain = AtomCausalChain(
+                rdep_chain, "dev-libs/b-1.0", worker=worker, cache=cache)
+            return [(l.level, l.pkgname, l.items) for l in chain.causal_chain]
+    with DepvarCache(tmp_path / "cache.sqlite") as cache:
+        expected = links(cache)
+    fake_portageq(metadata={})
+    with DepvarCache(tmp_path / "cache.sqlite") as cache:
+        assert links(cache) == expected
+        assert cache.misses["depvars"] == 0
+    with DepvarCache(tmp_path / "cache.sqlite", max_age=0) as cache:
+        assert links(cache) == [
+            (0, "dev-libs/b-1.0", []), (1, "app-misc/a-2.0", []),
+            (2, "@selected", []), (1, "dev-libs/c-1.0", [])]
+        assert cache.misses["depvars"] == 2
@@ -0,0 +1,72 @@
+from revdep.catpkg import get_catpkg, build_catpkg_index, get_reasons
+from revdep.depvar_parser import EbuildDepvarParser
+from revdep.tree import kind_key
+from test_parser_modes import DEPVARS
+import pytest
+
+@pytest.mark.parametrize("atom", [
+    "media-video/pipewire-1.4.2",
+    "sys-apps/systemd-utils-255.15-r1",
+    "acct-group/audio",
+    ">=dev-libs/glib-2.78:2",
+    "!!<sys-apps/foo-1.2",
+    "~dev-lang/python-3.12.1:3.12/3.12",
+    "dev-qt/qtgui:5[X(+),wayland?]",
+    "x11-libs/gtk+:3 ",
+    "dev-libs/libxml2-2.11*",
+])
+def test_get_catpkg(atom):
+    r"""
+    The fast path must agree with the CatPkg of the parsed Atom.
+
+    """
+    parser = EbuildDepvarParser(atom)
+    parser.root()
+    tree = parser.to_tree()
+    catpkg = tree.traverse_branches(["Atom", "CatPkg"], lambda t: t.data.kind)
+    assert get_catpkg(atom) == catpkg[0].data.value.strip()
+
+def test_get_catpkg_cache():
+    get_catpkg.cache_clear()
+    get_catpkg("dev-libs/glib-2.78")
+    get_catpkg("dev-libs/glib-2.78")
+    info = get_catpkg.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+def check_for_atom(tree, pkg, prefix=[]):
+    r"""
+    Reference implementation of `get_reasons`: the reasons a package is in a
+    depvar, found by traversing the whole tree.
+
+    """
+    x = kind_key
+    pkg = get_catpkg(pkg)
+    reasons = []
+    pkgnames = [
+        get_catpkg(b.traverse_branches(["CatPkg"], x)[0].data.value)
+        for b in tree.traverse_branches(["Atom"], x)]
+    if pkg in pkgnames:
+        reasons += prefix+[pkg]
+    for kind, symbol in [
+        ("AnyOfGroup", "||"), ("ExactlyOneOfGroup", "^^"), ("MostOneOfGroup", "??"),
+    ]:
+        for b in tree.traverse_branches([kind], x):
+            reasons += check_for_atom(b, pkg, prefix+[symbol])
+    for b in tree.traverse_branches(["DynamicUse"], x):
+        use_query = b.traverse_branches(["UseQuery"], x)[0].data.value
+        reasons += check_for_atom(b, pkg, prefix+[use_query])
+    return reasons
+
+@pytest.mark.parametrize("depvar", DEPVARS)
+def test_catpkg_index(depvar):
+    r"""
+    Index lookups must give the reasons of a tree traversal for every package
+    of the depvar and for packages it does not have.
+
+    """
+    parser = EbuildDepvarParser(depvar)
+    parser.root()
+    tree = parser.to_tree()
+    index = build_catpkg_index(tree)
+    for atom in [*index, "dev-libs/missing-1.0"]:
+        assert get_reasons(index, atom) == check_for_atom(tree, atom)
@@ -0,0 +1,38 @@
+from revdep.closure import ReachabilityIndex
+from revdep.rdep_chain import SystemReverseDependencyChain
+from test_rdep_chain import EMERGE_RDEPS
+
+def test_closure():
+    rdep_chain = SystemReverseDependencyChain(EMERGE_RDEPS)
+    index = ReachabilityIndex.from_graph(rdep_chain)
+    for pkgname in [*rdep_chain.dependees_by_dependency, "@selected"]:
+        chain = list(rdep_chain.get_pkg_rdep_chain(pkgname))
+        expected = {p for l, p in chain[1:]}
+        assert set(index.closure(pkgname)) == expected
+        assert len(index.closure(pkgname)) == len(expected)
+    pkgname, dependees = next(iter(rdep_chain.dependees_by_dependency.items()))
+    assert index.reaches(pkgname, dependees[0])
+    assert not index.reaches(pkgname, pkgname)
+    assert index.closure("dev-libs/missing-1") == []
+    assert not index.reaches("dev-libs/missing-1", "@selected")
+
+def test_closure_cycles():
+    rdep_chain = SystemReverseDependencyChain("")
+    rdep_chain.dependees_by_dependency = {
+        "a": ["b"], "b": ["c"], "c": ["b", "d"], "d": ["@selected"], "e": ["e"]}
+    index = ReachabilityIndex.from_graph(rdep_chain)
+    assert index.closure("a") == ["b", "c", "d", "@selected"]
+    assert index.closure("b") == ["b", "c", "d", "@selected"]
+    assert index.closure("d") == ["@selected"]
+    assert index.closure("e") == ["e"]
+    assert index.reaches("b", "b") and not index.reaches("a", "a")
+
+def test_closure_save(tmp_path):
+    rdep_chain = SystemReverseDependencyChain(EMERGE_RDEPS)
+    index = ReachabilityIndex.from_graph(rdep_chain)
+    index.save(tmp_path / "closure.json")
+    loaded = ReachabilityIndex.load(tmp_path / "closure.json")
+    assert loaded.names == index.names
+    assert loaded.closures == index.closures
+    for pkgname in list(rdep_chain.dependees_by_dependency)[::50]:
+        assert loaded.closure(pkgname) == index.closure(pkgname)
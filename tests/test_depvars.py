@@ -0,0 +1,152 @@
+import asyncio
+import time
+import pytest
+from revdep import depvars
+from revdep.atom_causal_chain import AtomCausalChain
+from revdep.cache import DepvarCache
+from revdep.rdep_chain import SystemReverseDependencyChain
+from conftest import EMERGE_OUTPUT, METADATA
+
+def test_get_depvars(fake_portageq):
+    assert depvars.get_depvars("dev-libs/c-1.0") == [
+        "", "|| ( dev-libs/b dev-libs/d )", "", "", "", ""]
+
+def test_get_depvars_batch(fake_portageq):
+    pkgnames = ["app-misc/a-2.0", "dev-libs/c-1.0", "dev-libs/missing-1"]
+    batch = depvars.get_depvars_batch(pkgnames, portage_api=False)
+    assert batch == {pkgname: depvars.get_depvars(pkgname) for pkgname in pkgnames}
+
+def test_worker_without_portageq(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    with depvars.PortageqWorker(portage_api=False) as worker:
+        for pkgname in ["app-misc/a-2.0", "dev-libs/c-1.0"]:
+            with pytest.raises(Exception, match="FileNotFoundError"):
+                worker.get_depvars(pkgname)
+
+def test_failed_fetch_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    with DepvarCache(":memory:") as cache:
+        with depvars.PortageqWorker(portage_api=False) as worker:
+            chain = AtomCausalChain(
+                rdep_chain, "dev-libs/b-1.0", worker=worker, cache=cache)
+            with pytest.raises(Exception, match="Fetching app-misc/a-2.0 failed"):
+                list(chain.causal_chain)
+        assert cache.get_depvars("app-misc/a-2.0") is None
+
+def test_worker_exited(fake_portageq):
+    with depvars.PortageqWorker(portage_api=False) as worker:
+        worker._processes[0].kill()
+        with pytest.raises(Exception, match="exited while fetching app-misc/a-2.0"):
+            worker.get_depvars("app-misc/a-2.0")
+        assert worker.get_depvars("dev-libs/c-1.0") == depvars.get_depvars(
+            "dev-libs/c-1.0")
+
+def test_causal_chain_worker(fake_portageq):
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    with depvars.PortageqWorker(portage_api=False) as worker:
+        chain = AtomCausalChain(rdep_chain, "dev-libs/b-1.0", worker=worker)
+        links = [(l.level, l.pkgname, l.items) for l in chain.causal_chain]
+    assert links == [
+        (0, "dev-libs/b-1.0", []),
+        (1, "app-misc/a-2.0", [
+            ("DEPEND", ["dev-libs/b"]), ("RDEPEND", ["dev-libs/b"])]),
+        (2, "@selected", []),
+        (1, "dev-libs/c-1.0", [("RDEPEND", ["||", "dev-libs/b"])]),
+    ]
+
+def test_metadata_reader(tmp_path):
+    vdb_path = tmp_path / "var/db/pkg/app-misc/a-2.0"
+    vdb_path.mkdir(parents=True)
+    (vdb_path / "DEPEND").write_text("dev-libs/b\n")
+    (vdb_path / "RDEPEND").write_text(">=dev-libs/b-1.0 x? ( dev-libs/c )\n")
+    cache_path = tmp_path / "var/db/repos/gentoo/metadata/md5-cache/dev-libs"
+    cache_path.mkdir(parents=True)
+    (cache_path / "c-1.0").write_text(
+        "EAPI=8\nRDEPEND=|| ( dev-libs/b dev-libs/d )\nSLOT=0\n")
+
+    with depvars.MetadataReader(root=tmp_path) as reader:
+        assert reader.get_depvars("app-misc/a-2.0") == [
+            "dev-libs/b", ">=dev-libs/b-1.0 x? ( dev-libs/c )", "", "", "", ""]
+        assert reader.get_depvars("dev-libs/c-1.0") == [
+            "", "|| ( dev-libs/b dev-libs/d )", "", "", "", ""]
+        assert reader.get_depvars("dev-libs/missing-1") == [""]
+
+def test_causal_chain_jobs(fake_portageq):
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    def links(jobs):
+        with depvars.PortageqWorker(portage_api=False, processes=jobs) as worker:
+            chain = AtomCausalChain(
+                rdep_chain, "dev-libs/b-1.0", worker=worker, jobs=jobs)
+            return [(l.level, l.pkgname, l.items) for l in chain.causal_chain]
+    assert links(3) == links(1)
+
+def test_get_depvars_async(fake_portageq):
+    async def get_all(pkgnames):
+        semaphore = asyncio.BoundedSemaphore(2)
+        return await asyncio.gather(*(
+            depvars.get_depvars_async(pkgname, semaphore) for pkgname in pkgnames))
+    pkgnames = ["app-misc/a-2.0", "dev-libs/c-1.0", "dev-libs/missing-1"]
+    assert asyncio.run(get_all(pkgnames)) == [
+        depvars.get_depvars(pkgname) for pkgname in pkgnames]
+
+def test_get_depvars_async_default_semaphore(fake_portageq):
+    fake_portageq(delay=0.2)
+    async def get_all(pkgnames):
+        return await asyncio.gather(*(
+            depvars.get_depvars_async(pkgname) for pkgname in pkgnames))
+    start = time.perf_counter()
+    asyncio.run(get_all(["app-misc/a-2.0", "dev-libs/c-1.0", "dev-libs/missing-1"]))
+    assert time.perf_counter() - start >= 0.6
+
+def test_async_causal_chain(fake_portageq):
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    async def links():
+        chain = AtomCausalChain(rdep_chain, "dev-libs/b-1.0")
+        return [
+            (l.level, l.pkgname, l.items)
+            async for l in chain.async_causal_chain(jobs=2)]
+    with depvars.PortageqWorker(portage_api=False) as worker:
+        chain = AtomCausalChain(rdep_chain, "dev-libs/b-1.0", worker=worker)
+        expected = [(l.level, l.pkgname, l.items) for l in chain.causal_chain]
+    assert asyncio.run(links()) == expected
+
+def test_async_causal_chain_worker(tmp_path):
+    cache_path = tmp_path / "var/db/repos/gentoo/metadata/md5-cache"
+    for pkgname, metadata in METADATA.items():
+        (cache_path / pkgname).parent.mkdir(parents=True, exist_ok=True)
+        (cache_path / pkgname).write_text(
+            "".join(f"{k}={v}\n" for k, v in metadata.items()))
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    with depvars.MetadataReader(root=tmp_path) as reader:
+        async def links():
+            chain = AtomCausalChain(rdep_chain, "dev-libs/b-1.0", worker=reader)
+            return [
+                (l.level, l.pkgname, l.items)
+                async for l in chain.async_causal_chain(jobs=2)]
+        chain = AtomCausalChain(rdep_chain, "dev-libs/b-1.0", worker=reader)
+        expected = [(l.level, l.pkgname, l.items) for l in chain.causal_chain]
+        assert asyncio.run(links()) == expected
+    assert expected[1][2]
+
+def test_async_causal_chain_cache(tmp_path):
+    cache_path = tmp_path / "var/db/repos/gentoo/metadata/md5-cache"
+    for pkgname, metadata in METADATA.items():
+        (cache_path / pkgname).parent.mkdir(parents=True, exist_ok=True)
+        (cache_path / pkgname).write_text(
+            "".join(f"{k}={v}\n" for k, v in metadata.items()))
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    with depvars.MetadataReader(root=tmp_path) as reader, \
+            DepvarCache(":memory:") as cache:
+        async def links():
+            chain = AtomCausalChain(
+                rdep_chain, "dev-libs/b-1.0", worker=reader, cache=cache)
+            return [
+                (l.level, l.pkgname, l.items)
+                async for l in chain.async_causal_chain(jobs=2)]
+        chain = AtomCausalChain(rdep_chain, "dev-libs/b-1.0", worker=reader)
+        expected = [(l.level, l.pkgname, l.items) for l in chain.causal_chain]
+        assert asyncio.run(links()) == expected
+        assert cache.hits["depvars"] == 0
+        assert asyncio.run(links()) == expected
+        assert cache.hits["depvars"] == cache.misses["depvars"] > 0
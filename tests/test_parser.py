@@ -187,6 +187,47 @@ def test_version(depvar,version):
     parser.version()
     assert parser.to_tree().data.value == version
 
+@pytest.mark.parametrize("depvar,versions", [
+    (">=a/b-1.0", [
+        ("VersionGate",">="),
+        ("Version","-1.0"),
+        ("VersionSep","-"),
+        ("VersionNumber","1.0"),
+        ("VersionMajor","1"),
+        ("VersionMinor",".0"),
+        ("VersionDelimiter","."),
+    ]),
+    ("=a/b-2_rc1-r3 ", [
+        ("VersionGate","="),
+        ("Version","-2_rc1-r3 "),
+        ("VersionSep","-"),
+        ("VersionNumber","2"),
+        ("VersionMajor","2"),
+        ("VersionRelease","_rc1"),
+        ("VersionReleaseSep","_"),
+        ("VersionReleasePrefix","rc"),
+        ("VersionReleaseSuffix","1"),
+        ("VersionRevision","-r3"),
+        ("VersionSep","-"),
+    ]),
+])
+def test_atom_version(depvar,versions):
+    r"""
+    The package name stops where a version starts, found by looking ahead
+    for a version at every character. The lookahead must leave no parcels
+    behind, an atom has a single version subtree.
+
+    """
+    parser = EbuildDepvarParser(depvar)
+    parser.atom()
+    def walk(tree):
+        yield tree
+        for b in tree.branches: yield from walk(b)
+    assert [
+        (t.data.kind, t.data.value) for t in walk(parser.to_tree())
+        if t.data.kind.startswith("Version")
+    ] == versions
+
 @pytest.mark.parametrize("depvar,all_of_group", [
     ("()","()"),
     ("( )","( )"),
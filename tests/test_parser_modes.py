@@ -0,0 +1,159 @@
+from revdep.depvar_parser import EbuildDepvarParser
+from revdep.lexer import LEXED_KINDS
+from revdep.parser_stats import ParserStats
+from revdep.catpkg import build_catpkg_index, CAUSAL_CHAIN_KINDS
+from revdep.tree_path import compile_path
+import pytest
+
+DEPVARS = [
+    "media-video/pipewire-1.4.2",
+    "sys-apps/systemd-utils-255.15-r1",
+    "acct-group/audio",
+    "a/b-1.4 ",
+    "virtual/pkgconfig sys-devel/gettext",
+    ">=dev-libs/glib-2.0 x11-libs/gtk+:3 X? ( x11-libs/libX11 ) || ( a/b c/d )",
+    ">=dev-libs/glib-2.78:2 >=media-libs/libpng-1.6.0:0= sys-libs/zlib:=",
+    "dev-qt/qtcore:5[icu,-debug] dev-qt/qtgui:5[X(+),wayland?] "
+    "^^ ( a/b c/d ) ?? ( e/f g/h ) ( i/j k/l )",
+    "~dev-lang/python-3.12.1:3.12/3.12 =dev-libs/libxml2-2.11*",
+    "python_targets_python3_11? ( dev-lang/python:3.11[sqlite] ) "
+    "python_targets_python3_12? ( dev-lang/python:3.12[sqlite] )",
+    "|| ( ( dev-lang/python:3.12 dev-python/foo[python_targets_python3_12(-)] ) "
+    "( dev-lang/python:3.11 dev-python/foo[python_targets_python3_11(-)] ) )",
+    "!app-misc/foo !!app-misc/bar test? ( >=dev-util/cmocka-1.1 )",
+    "a? ( b? ( c? ( !d? ( x/y-1.0 ) ) ) ) ssl? ( || ( dev-libs/openssl:0= "
+    "dev-libs/libressl ) )",
+    "|| ( ) ( ",
+    "",
+]
+
+def dump(tree):
+    data = tree.data
+    return (
+        data.kind, data.index_start, data.index_end, data.value,
+        [dump(b) for b in tree.branches])
+
+def prune(dumped, kinds):
+    r"""
+    Drop nodes of the given kinds from a dumped tree, their branches move up
+    to the parent.
+
+    """
+    kind, start, end, value, branches = dumped
+    pruned = []
+    for b in branches:
+        b = prune(b, kinds)
+        pruned += b[4] if b[0] in kinds else [b]
+    return (kind, start, end, value, pruned)
+
+def parse(depvar, **kwargs):
+    parser = EbuildDepvarParser(depvar, **kwargs)
+    parser.root()
+    return parser
+
+@pytest.mark.parametrize("depvar", DEPVARS)
+def test_packrat(depvar):
+    r"""
+    Packrat mode only memoizes rules, it must give the same trees.
+
+    """
+    expected = parse(depvar)
+    actual = parse(depvar, packrat=True)
+    assert actual.i == expected.i
+    assert dump(actual.to_tree()) == dump(expected.to_tree())
+
+@pytest.mark.parametrize("depvar", DEPVARS)
+@pytest.mark.parametrize("packrat", [False, True])
+def test_lexer(depvar, packrat):
+    r"""
+    The lexer consumes character classes as runs without recording parcels,
+    the rest of the tree must be the same.
+
+    """
+    expected = parse(depvar)
+    actual = parse(depvar, packrat=packrat, lexer=True)
+    assert actual.i == expected.i
+    assert dump(actual.to_tree()) == prune(dump(expected.to_tree()), LEXED_KINDS)
+
+def test_stats():
+    stats = ParserStats()
+    for depvar in DEPVARS:
+        expected = parse(depvar)
+        actual = parse(depvar, stats=stats)
+        assert dump(actual.to_tree()) == dump(expected.to_tree())
+    assert "read" not in vars(expected)
+
+    root = stats.rules["Root"]
+    assert root.calls == len(DEPVARS)
+    assert root.chars == sum(parse(depvar).i for depvar in DEPVARS)
+    for rule in stats.rules.values():
+        assert rule.successes + rule.failures == rule.calls
+        assert rule.time <= root.time
+    assert stats.rules["Version"].backtracks > 0
+    assert stats.rules["Digit"].backtracks == 0
+
+    table = stats.format_table(sort_by="calls").splitlines()
+    assert table[0].split() == [
+        "rule", "calls", "success", "fail", "backtrack", "chars", "time", "ms"]
+    calls = [int(line.split()[1]) for line in table[1:]]
+    assert calls == sorted(calls, reverse=True)
+
+@pytest.mark.parametrize("depvar", DEPVARS)
+def test_compact_tree(depvar):
+    parser = parse(depvar)
+    tree = parser.to_tree()
+    compact = parser.to_compact_tree()
+    node = compact.root()
+    assert dump(node) == dump(tree)
+    assert repr(node) == repr(tree)
+    assert dump(node.to_tree()) == dump(tree)
+    assert node.root is None
+    for b in node.branches: assert b.root == node
+    kind = lambda t: t.data.kind
+    assert [dump(b) for b in node.traverse_branches(["Atom"], kind)] == (
+        [dump(b) for b in tree.traverse_branches(["Atom"], kind)])
+    assert build_catpkg_index(node) == build_catpkg_index(tree)
+    assert compact.memory_usage() == 22*len(compact)
+    for t in compile_path("**")(node):
+        for kind in {b.kind for b in t.branches} | {"Missing"}:
+            assert t.get_branches(kind) == [b for b in t.branches if b.kind == kind]
+
+@pytest.mark.parametrize("depvar", DEPVARS)
+@pytest.mark.parametrize("packrat", [False, True])
+@pytest.mark.parametrize("lexer", [False, True])
+def test_builder(depvar, packrat, lexer):
+    r"""
+    Trees built while parsing must equal the ones nested by `to_tree`.
+
+    """
+    expected = parse(depvar, packrat=packrat, lexer=lexer)
+    actual = parse(depvar, packrat=packrat, lexer=lexer, builder=True)
+    assert actual.i == expected.i
+    assert [p.kind for p in actual.parcels] == [p.kind for p in expected.parcels]
+    assert dump(actual.to_tree()) == dump(expected.to_tree())
+
+@pytest.mark.parametrize("depvar", DEPVARS)
+@pytest.mark.parametrize("kinds", [
+    CAUSAL_CHAIN_KINDS, {"Atom", "Digit", "UseName"}, {"Root"}])
+@pytest.mark.parametrize("builder", [False, True])
+def test_kinds(depvar, kinds, builder):
+    r"""
+    Kinds that are not kept are matched without parcels, the tree is the
+    full one with their nodes pruned.
+
+    """
+    expected = parse(depvar)
+    actual = parse(depvar, kinds=kinds, builder=builder, packrat=builder)
+    assert actual.i == expected.i
+    assert {p.kind for p in actual.parcels} <= set(kinds) | {"Root"}
+    dropped = {p.kind for p in expected.parcels} - set(kinds) - {"Root"}
+    assert dump(actual.to_tree()) == prune(dump(expected.to_tree()), dropped)
+    if kinds is CAUSAL_CHAIN_KINDS:
+        assert actual.lexer is not None
+        assert build_catpkg_index(actual.to_tree()) == (
+            build_catpkg_index(expected.to_tree()))
+
+def test_kinds_lexer():
+    with pytest.raises(Exception, match="Digit"):
+        EbuildDepvarParser("a/b-1", lexer=True, kinds={"Atom", "Digit"})
+    assert EbuildDepvarParser("a/b-1", kinds={"Atom", "Digit"}).lexer is None
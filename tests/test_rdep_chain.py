@@ -0,0 +1,114 @@
+import io
+from pathlib import Path
+from revdep.rdep_chain import SystemReverseDependencyChain
+from conftest import EMERGE_OUTPUT
+
+EMERGE_RDEPS = (Path(__file__).parent.parent / "revdep" / "emerge_rdeps.txt").read_text()
+
+def test_file_input():
+    expected = SystemReverseDependencyChain(EMERGE_RDEPS).dependees_by_dependency
+    assert len(expected) == 725
+    assert sum(map(len, expected.values())) == 4130
+    rdep_chain = SystemReverseDependencyChain(io.StringIO(EMERGE_RDEPS))
+    assert rdep_chain.dependees_by_dependency == expected
+
+def test_stream():
+    rdep_chain = SystemReverseDependencyChain(
+        io.StringIO(EMERGE_OUTPUT), stream=True)
+    assert rdep_chain.dependees_by_dependency == {}
+    ingest = rdep_chain.ingest()
+    assert next(ingest) == "app-misc/a-2.0"
+    assert next(ingest) == "dev-libs/b-1.0"
+    assert rdep_chain.dependees_by_dependency == {
+        "app-misc/a-2.0": ["@selected"],
+        "dev-libs/b-1.0": ["app-misc/a-2.0", "dev-libs/c-1.0"],
+    }
+    assert list(ingest) == ["dev-libs/c-1.0"]
+
+def test_compact_graph():
+    rdep_chain = SystemReverseDependencyChain(EMERGE_RDEPS)
+    graph = rdep_chain.compact()
+    assert dict(graph) == rdep_chain.dependees_by_dependency
+    assert list(graph) == list(rdep_chain.dependees_by_dependency)
+    for pkgname in [*list(graph)[::25], "@selected", "dev-libs/missing-1"]:
+        assert list(graph.get_pkg_rdep_chain(pkgname)) == list(
+            rdep_chain.get_pkg_rdep_chain(pkgname))
+
+def test_traversal_order():
+    rdep_chain = SystemReverseDependencyChain(EMERGE_RDEPS)
+    graph = rdep_chain.compact()
+    for pkgname in list(graph)[::25]:
+        dfs = list(rdep_chain.get_pkg_rdep_chain(pkgname))
+        bfs = list(rdep_chain.get_pkg_rdep_chain(pkgname, order="bfs"))
+        assert list(graph.get_pkg_rdep_chain(pkgname, order="bfs")) == bfs
+        assert {p for l, p in bfs} == {p for l, p in dfs}
+        assert [l for l, p in bfs] == sorted(l for l, p in bfs)
+        shallow = list(rdep_chain.get_pkg_rdep_chain(pkgname, max_depth=2))
+        assert list(graph.get_pkg_rdep_chain(pkgname, max_depth=2)) == shallow
+        assert all(l <= 2 for l, p in shallow)
+
+def test_traversal_deep_chain():
+    dependees = {f"p{i}": [f"p{i+1}"] for i in range(5000)}
+    rdep_chain = SystemReverseDependencyChain("")
+    rdep_chain.dependees_by_dependency = dependees
+    chain = list(rdep_chain.get_pkg_rdep_chain("p0"))
+    assert chain == [(i, f"p{i}") for i in range(5001)]
+    assert list(rdep_chain.get_pkg_rdep_chain("p0", max_depth=3)) == chain[:4]
+
+def test_from_previous(tmp_path):
+    previous = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    output = EMERGE_OUTPUT.replace(
+        "    dev-libs/c-1.0 requires dev-libs/b\n",
+        "    dev-libs/d-1.0 requires dev-libs/b\n",
+    ).replace(
+        "  dev-libs/c-1.0 pulled in by:\n    app-misc/a-2.0 requires dev-libs/c\n",
+        "  dev-libs/d-1.0 pulled in by:\n    @selected\n")
+    rdep_chain, changes = SystemReverseDependencyChain.from_previous(previous, output)
+    assert rdep_chain.dependees_by_dependency == (
+        SystemReverseDependencyChain(output).dependees_by_dependency)
+    assert changes == {
+        "dev-libs/b-1.0": (["dev-libs/d-1.0"], ["dev-libs/c-1.0"]),
+        "dev-libs/d-1.0": (["@selected"], []),
+        "dev-libs/c-1.0": ([], ["app-misc/a-2.0"]),
+    }
+    assert rdep_chain.dependees_by_dependency["app-misc/a-2.0"] is (
+        previous.dependees_by_dependency["app-misc/a-2.0"])
+
+    previous.save_snapshot(tmp_path / "rdeps.snapshot")
+    graph = SystemReverseDependencyChain.load_snapshot(tmp_path / "rdeps.snapshot")
+    rdep_chain, snapshot_changes = SystemReverseDependencyChain.from_previous(graph, output)
+    assert snapshot_changes == changes
+    assert SystemReverseDependencyChain.from_previous(rdep_chain, output)[1] == {}
+
+def test_from_previous_large():
+    previous = SystemReverseDependencyChain(EMERGE_RDEPS)
+    pkgname, dependees = list(previous.dependees_by_dependency.items())[100]
+    dependee = dependees[0]
+    output = EMERGE_RDEPS.replace(f"    {dependee} ", f"    dev-libs/new-1 ", 1)
+    rdep_chain, changes = SystemReverseDependencyChain.from_previous(previous, output)
+    assert rdep_chain.dependees_by_dependency == (
+        SystemReverseDependencyChain(output).dependees_by_dependency)
+    assert len(changes) == 1
+    ((changed, (added, removed)),) = changes.items()
+    assert added == ["dev-libs/new-1"]
+
+def test_from_previous_reused_sections():
+    previous = SystemReverseDependencyChain(EMERGE_RDEPS)
+    before = {k: list(v) for k, v in previous.dependees_by_dependency.items()}
+    pkgname, other = list(previous.dependees_by_dependency)[200:202]
+    output = EMERGE_RDEPS.replace(
+        f"  {pkgname} pulled in by:\n",
+        f"  {pkgname} pulled in by:\n    dev-libs/new-1 requires {pkgname}\n", 1)
+    # A second section of a package whose first one is unchanged.
+    output = output.replace(
+        ">>>", f"  {other} pulled in by:\n    dev-libs/other-1\n\n>>>", 1)
+    rdep_chain, changes = SystemReverseDependencyChain.from_previous(previous, output)
+    assert rdep_chain.dependees_by_dependency == (
+        SystemReverseDependencyChain(output).dependees_by_dependency)
+    assert changes == {
+        pkgname: (["dev-libs/new-1"], []), other: (["dev-libs/other-1"], [])}
+    assert previous.dependees_by_dependency == before
+    reused = [
+        p for p, d in rdep_chain.dependees_by_dependency.items()
+        if d is previous.dependees_by_dependency[p]]
+    assert len(reused) == len(before) - 2
@@ -0,0 +1,46 @@
+import io
+import pytest
+from revdep.rdep_chain import SystemReverseDependencyChain
+from revdep.snapshot import StaleSnapshotError
+from conftest import EMERGE_OUTPUT
+from test_rdep_chain import EMERGE_RDEPS
+
+def test_snapshot(tmp_path):
+    path = tmp_path / "rdeps.snapshot"
+    rdep_chain = SystemReverseDependencyChain(EMERGE_RDEPS)
+    rdep_chain.save_snapshot(path)
+    graph = SystemReverseDependencyChain.load_snapshot(path, EMERGE_RDEPS)
+    assert dict(graph) == rdep_chain.dependees_by_dependency
+    assert list(graph) == list(rdep_chain.dependees_by_dependency)
+    assert graph.checksum == rdep_chain.checksum
+    for pkgname in [*list(graph)[::25], "@selected", "dev-libs/missing-1"]:
+        assert list(graph.get_pkg_rdep_chain(pkgname)) == list(
+            rdep_chain.get_pkg_rdep_chain(pkgname))
+    assert dict(SystemReverseDependencyChain.load_snapshot(
+        path, io.StringIO(EMERGE_RDEPS))) == dict(graph)
+
+def test_snapshot_stale(tmp_path):
+    path = tmp_path / "rdeps.snapshot"
+    SystemReverseDependencyChain(EMERGE_OUTPUT).save_snapshot(path)
+    with pytest.raises(StaleSnapshotError):
+        SystemReverseDependencyChain.load_snapshot(path, EMERGE_RDEPS)
+    graph = SystemReverseDependencyChain.load_snapshot(path)
+    assert graph["dev-libs/b-1.0"] == ["app-misc/a-2.0", "dev-libs/c-1.0"]
+
+def test_snapshot_invalid(tmp_path):
+    path = tmp_path / "rdeps.snapshot"
+    path.write_bytes(b"not a snapshot" * 8)
+    with pytest.raises(Exception, match="not a revdep snapshot"):
+        SystemReverseDependencyChain.load_snapshot(path)
+    path.write_bytes(b"")
+    with pytest.raises(Exception, match="not a revdep snapshot"):
+        SystemReverseDependencyChain.load_snapshot(path)
+
+def test_snapshot_resave(tmp_path):
+    path = tmp_path / "rdeps.snapshot"
+    rdep_chain = SystemReverseDependencyChain(EMERGE_RDEPS)
+    rdep_chain.save_snapshot(path)
+    graph = SystemReverseDependencyChain.load_snapshot(path)
+    SystemReverseDependencyChain(EMERGE_OUTPUT).save_snapshot(path)
+    assert dict(graph) == rdep_chain.dependees_by_dependency
+    assert [p.name for p in tmp_path.iterdir()] == ["rdeps.snapshot"]
@@ -0,0 +1,41 @@
+import io
+import json
+from revdep import depvars
+from revdep.__main__ import main
+from revdep.atom_causal_chain import AtomCausalChain
+from revdep.rdep_chain import SystemReverseDependencyChain
+from revdep.sweep import sweep, write_jsonl
+from conftest import EMERGE_OUTPUT
+
+def expected_chains(rdep_chain):
+    with depvars.PortageqWorker(portage_api=False) as worker:
+        return {
+            pkgname: [
+                link.to_dict() for link in AtomCausalChain(
+                    rdep_chain, pkgname, worker=worker).causal_chain]
+            for pkgname in rdep_chain.dependees_by_dependency}
+
+def test_sweep(fake_portageq, tmp_path):
+    rdep_chain = SystemReverseDependencyChain(EMERGE_OUTPUT)
+    expected = expected_chains(rdep_chain)
+    results = list(sweep(rdep_chain, jobs=2))
+    assert sorted(r["pkgname"] for r in results) == sorted(expected)
+    assert {r["pkgname"]: r["links"] for r in results} == expected
+
+    rdep_chain.save_snapshot(tmp_path / "rdeps.snapshot")
+    results = sweep(tmp_path / "rdeps.snapshot", pkgnames=["dev-libs/b-1.0"], jobs=1)
+    assert list(results) == [
+        {"pkgname": "dev-libs/b-1.0", "links": expected["dev-libs/b-1.0"]}]
+
+def test_write_jsonl(fake_portageq, tmp_path, capsys):
+    out = io.StringIO()
+    write_jsonl([{"pkgname": "a", "links": []}, {"pkgname": "b", "error": "e"}], out)
+    assert out.getvalue() == (
+        '{"pkgname": "a", "links": []}\n{"pkgname": "b", "error": "e"}\n')
+
+    emerge_output = tmp_path / "emerge_rdeps.txt"
+    emerge_output.write_text(EMERGE_OUTPUT)
+    assert main(["--emerge-output", str(emerge_output), "--all", "-j", "2"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert sorted(json.loads(line)["pkgname"] for line in lines) == [
+        "app-misc/a-2.0", "dev-libs/b-1.0", "dev-libs/c-1.0"]
@@ -0,0 +1,63 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from revdep import compact_tree
+from revdep.parcel import Parcel
+from revdep.tree import Tree, kind_key
+from revdep.tree_path import compile_path
+from test_parser_modes import DEPVARS, dump, parse
+
+def walk(tree):
+    yield tree
+    for b in tree.branches: yield from walk(b)
+
+@pytest.mark.parametrize("depvar", DEPVARS)
+def test_kind_key(depvar):
+    tree = parse(depvar).to_tree()
+    key = lambda t: t.data.kind
+    for t in walk(tree):
+        for kind in {b.data.kind for b in t.branches} | {"Atom", "Missing"}:
+            assert t.traverse_branches([kind], kind_key) == (
+                t.traverse_branches([kind], key))
+            assert t.get_branches(kind) == [
+                b for b in t.branches if b.data.kind == kind]
+
+def test_kind_index_add_branch():
+    tree = Tree(Parcel(0, 3, "a/b", "Atom"))
+    tree.add_branch(Tree(Parcel(0, 1, "a", "CategoryName")))
+    assert tree.get_branches("PackageName") == []
+    package = Tree(Parcel(2, 3, "b", "PackageName"))
+    tree.add_branch(package)
+    assert tree.get_branches("PackageName") == [package]
+    assert tree.traverse_branches(["PackageName"], kind_key) == [package]
+
+@pytest.mark.parametrize("depvar", DEPVARS)
+def test_compile_path(depvar):
+    parser = parse(depvar)
+    for tree in [parser.to_tree(), parser.to_compact_tree().root()]:
+        nodes = list(walk(tree))
+        catpkgs = [
+            c for t in nodes if t.data.kind == "Atom"
+            for c in t.branches if c.data.kind == "CatPkg"]
+        by_start = lambda t: (t.data.index_start, -t.data.index_end)
+        assert sorted(compile_path("**/Atom/CatPkg")(tree), key=by_start) == catpkgs
+        assert compile_path("**/**/Atom/CatPkg")(tree) == (
+            compile_path("**/Atom/CatPkg")(tree))
+        assert compile_path("**")(tree) == nodes
+        assert compile_path("*")(tree) == tree.branches
+        assert compile_path(("*", "**"))(tree) == nodes[1:]
+        assert compile_path("Atom")(tree) == tree.get_branches("Atom")
+        use_queries = [
+            dump(c) for t in nodes if t.data.kind == "DynamicUse"
+            for c in t.branches if c.data.kind == "UseQuery"]
+        assert sorted(
+            dump(t) for t in compile_path("**/DynamicUse/UseQuery")(tree)) == (
+            sorted(use_queries))
+    assert compile_path("**/Atom/CatPkg") is compile_path("**/Atom/CatPkg")
+
+def test_kind_id_threads():
+    kinds = [f"test_kind_{i}" for i in range(200)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = list(executor.map(
+            lambda k: [compact_tree.kind_id(kind) for kind in kinds], range(8)))
+    assert all(kind_ids == ids[0] for kind_ids in ids)
+    assert [compact_tree.KINDS[i] for i in ids[0]] == kinds